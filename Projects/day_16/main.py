@@ -1,41 +1,585 @@
 import os
-from scripts.loader import read_csv, clean_data, load_to_sql, load_to_mongo
+import time
+import argparse
+from dataclasses import dataclass
+from functools import partial
+from scripts.loader import (
+    read_csv, clean_data, load_to_sql, load_to_mongo,
+    iter_csv, iter_clean, clean_batches, batched, stream_to_sql, stream_to_mongo, SQL_LOAD_MODES, READ_BACKENDS,
+    get_mongo_client, SQLITE_PROFILES, NATURAL_KEY, parse_key,
+)
+from scripts.metrics import RunReport
+from scripts.validation import RULES, QuarantineSink
+from scripts.columnar_sink import COLUMNAR_FORMATS
+from scripts.schema import parse_overrides
+from scripts.compressed import detect_compression
+from scripts.profiling import PROFILERS, profile_run
 
 # Define paths relative to this script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "data", "students.csv")
 SQL_DB_PATH = os.path.join(BASE_DIR, "school.db")
+REPORTS_DIR = os.path.join(BASE_DIR, "reports")
+PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
+REJECTS_PATH = os.path.join(BASE_DIR, "data", "rejects.csv")
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "checkpoints", "stream.json")
+BATCH_SIZE = 1000
 
-def run_pipeline():
+@dataclass
+class PipelineOptions:
+    """Every knob of a pipeline run (filled from the command line in __main__)."""
+    stream: bool = False
+    batch_size: int = BATCH_SIZE
+    sql_mode: str = "core"
+    sql_profile: str = "default"  # "bulk": WAL, bigger cache, indexes rebuilt after the load
+    ordered: bool = True
+    workers: int = 1
+    reader: str = "csv"
+    csv_cache: bool = False
+    read_ahead: bool = False  # decompress gzip/bz2/xz/zstd input in a background thread
+    typed: bool = False  # row engine: infer column types and convert while parsing
+    schema_overrides: dict | None = None  # {"marks": "int"}: types that win over the inferred ones
+    engine: str = "row"
+    incremental: bool = False
+    upsert: bool = False
+    key: tuple = NATURAL_KEY  # columns that identify a student for --upsert / --incremental
+    drop_key_duplicates: bool = False  # delete stored rows sharing a key so its unique index can be built
+    fanout: bool = False
+    queue_size: int = 4
+    writers: int = 1  # concurrent SQL / Mongo writers in batch, sharded and incremental mode
+    report_path: str | None = None  # default: reports/run_<UTC timestamp>.json
+    prometheus_path: str | None = None
+    export_dir: str | None = None  # also write the cleaned rows as a Parquet / Arrow dataset here
+    export_format: str = "parquet"
+    aggregate: bool = False  # also write per-city marks statistics to the aggregates table
+    dedup: bool = False  # drop rows whose normalized (name, city, marks) was already seen this run
+    validate: bool = True  # False = old behaviour: bad marks become 0, one warning per row
+    rejects_path: str = REJECTS_PATH
+    resume: bool = False  # streaming mode: continue from the last checkpoint
+    checkpoint_path: str = CHECKPOINT_PATH
+    config_path: str | None = None  # run the stage graph from this TOML/YAML file instead
+    input_path: str | None = None  # a directory or glob of CSV shards instead of CSV_PATH
+    profiler: str | None = None  # "sample" / "cprofile": profile the run into PROFILES_DIR
+
+def run_mode(options):
+    if options.config_path:
+        return "dag"
+    if options.incremental:
+        return "incremental"
+    if options.input_path:
+        return "sharded"
+    if options.fanout:
+        return "fanout"
+    return "stream" if options.stream else f"batch-{options.engine}"
+
+def run_pipeline(options=None):
+    options = options or PipelineOptions()
     print("=== Starting Mini-ETL Pipeline ===")
-    
-    # 1. EXTRACT
-    raw_data = read_csv(CSV_PATH)
-    
-    if not raw_data:
-        print("Pipeline aborted due to missing data.")
+    if options.config_path:
+        run_dag_pipeline(options)
+        return
+
+    # One pooled Mongo client for the whole run (MongoClient connects lazily,
+    # so this is free if Mongo loading stays commented out)
+    mongo_client = get_mongo_client(max_pool_size=max(10, options.writers))
+    report = RunReport(run_mode(options))
+    # Resumed loads and increments never read the earlier rows again, so keep their rejects
+    append = options.resume or options.incremental
+    quarantine = QuarantineSink(options.rejects_path, append=append) if options.validate else None
+    try:
+        if options.drop_key_duplicates:
+            drop_stored_key_duplicates(options, mongo_client)
+        if options.incremental:
+            run_incremental_pipeline(options, mongo_client, report, quarantine)
+        elif options.input_path:
+            run_sharded_pipeline(options, mongo_client, report, quarantine)
+        elif options.fanout:
+            run_fanout_pipeline(options, mongo_client, report, quarantine)
+        elif options.stream:
+            run_streaming_pipeline(options, mongo_client, report, quarantine)
+        else:
+            run_batch_pipeline(options, mongo_client, report, quarantine)
+    finally:
+        mongo_client.close()
+        if quarantine is not None:
+            quarantine.close()
+            report.stage("quarantine").rows = quarantine.rows
+        write_report(report.finish(), options)
+
+def drop_stored_key_duplicates(options, mongo_client):
+    """--drop-key-duplicates: the opt-in cleanup that lets the unique index on --key be built."""
+    from scripts.loader import make_engine, drop_key_duplicates, drop_mongo_key_duplicates
+
+    engine = make_engine(SQL_DB_PATH)
+    try:
+        drop_key_duplicates(engine, options.key)
+    finally:
+        engine.dispose()
+    try:
+        drop_mongo_key_duplicates(mongo_client["school"]["students_etl"], options.key)
+    except Exception as e:
+        print(f"Error removing duplicate keys from MongoDB: {e}")
+
+def rules_for(options):
+    return RULES if options.validate else None
+
+def schema_for(options, filepath=CSV_PATH):
+    """--typed / --schema: column types sampled from filepath (scripts/schema.py), else None."""
+    if not (options.typed or options.schema_overrides) or not os.path.exists(filepath):
+        return None
+    from scripts.schema import infer_schema
+    return infer_schema(filepath, overrides=options.schema_overrides)
+
+def write_report(report, options):
+    """Prints the stage summary and saves the JSON (and optional Prometheus) run report."""
+    report.print_summary()
+    stamp = report.started.strftime("%Y%m%dT%H%M%SZ")
+    report.write_json(options.report_path or os.path.join(REPORTS_DIR, f"run_{stamp}.json"))
+    if options.prometheus_path:
+        report.write_prometheus(options.prometheus_path)
+
+def dedup_for(options):
+    if not options.dedup:
+        return None
+    from scripts.dedup import Deduplicator
+    return Deduplicator()
+
+def replay_dedup(dedup, options, end):
+    """--resume --dedup: the Deduplicator isn't checkpointed, so it relearns the rows before the checkpoint.
+
+    They are read, validated and cleaned again like the first time, but not
+    loaded or quarantined; dropping the same duplicates leaves the same state.
+    """
+    from scripts.incremental import iter_csv_range
+
+    print(f"Dedup: relearning the rows before byte {end:,} of {CSV_PATH}...")
+    records = iter_csv_range(CSV_PATH, 0, end, schema=schema_for(options))
+    for batch in batched(iter_clean(records, rules_for(options)), options.batch_size):
+        dedup.remember(batch)
+
+def metered_batches(records, options, report, quarantine=None, dedup=None):
+    """Wraps a lazy extract -> transform chain so each stage's time and rows are measured.
+
+    Rows are batched straight off the reader, so each stage is timed once per
+    batch rather than once per row. Batches with rejected rows come out
+    smaller than batch_size.
+    """
+    from scripts.dedup import deduplicated
+
+    extracted = report.meter("extract", batched(records, options.batch_size))
+    cleaned = report.meter("transform", clean_batches(extracted, rules_for(options), quarantine), inner="extract")
+    return deduplicated(cleaned, dedup, report)
+
+def exported(batches, options, report):
+    """Writes every batch to the --export dataset before passing it on to the database sink."""
+    if not options.export_dir:
+        yield from batches
         return
+    from scripts.columnar_sink import ColumnarSink
+
+    sink = ColumnarSink(options.export_dir, options.export_format)
+    stats = report.stage(f"load:{sink.name}")
+    try:
+        for batch in batches:
+            start = time.perf_counter()
+            sink.write(batch)
+            elapsed = time.perf_counter() - start
+            stats.seconds += elapsed
+            stats.observe_batch(len(batch), elapsed)
+            yield batch
+    finally:
+        sink.close()
+
+def summarized(batches, options, report, merge=True, aggregator=None):
+    """--aggregate: feeds every batch to a per-city Aggregator (a new one unless given)
+    and writes the summary once the sink has asked for (and so committed) the last batch."""
+    if not options.aggregate:
+        yield from batches
+        return
+    from scripts.aggregate import Aggregator, aggregated, write_summary
+
+    aggregator = aggregator or Aggregator()
+    yield from aggregated(batches, aggregator, report)
+    write_summary(aggregator, SQL_DB_PATH, merge=merge)
+
+def sql_mode_for(options):
+    """--upsert wins over --sql-mode so reloads never duplicate rows."""
+    return "upsert" if options.upsert else options.sql_mode
+
+def run_batch_pipeline(options, mongo_client=None, report=None, quarantine=None):
+    """Reads the whole CSV, cleans it, then loads it."""
+    report = report or RunReport("batch")
+    if options.engine == "columnar":
+        # pandas is only imported when this engine is picked
+        from scripts.columnar import read_csv_columnar, clean_data_columnar
+
+        # 1. EXTRACT
+        with report.timed("extract") as extract:
+            raw_data = read_csv_columnar(CSV_PATH, cache=options.csv_cache)
+        if raw_data.empty:
+            print("Pipeline aborted due to missing data.")
+            return
+        clean = partial(clean_data_columnar, rules=rules_for(options), quarantine=quarantine)
+    else:
+        # 1. EXTRACT
+        with report.timed("extract") as extract:
+            raw_data = read_csv(CSV_PATH, backend=options.reader, workers=options.workers,
+                                cache=options.csv_cache, read_ahead=options.read_ahead,
+                                schema=schema_for(options))
+
+        if not raw_data:
+            print("Pipeline aborted due to missing data.")
+            return
+        clean = partial(clean_data, workers=options.workers, rules=rules_for(options), quarantine=quarantine)
+    extract.rows = len(raw_data)
+    extract.bytes = os.path.getsize(CSV_PATH)
 
     # 2. TRANSFORM
-    cleaned_data = clean_data(raw_data)
-    
+    with report.timed("transform") as transform:
+        cleaned_data = clean(raw_data)
+    transform.rows = len(cleaned_data)
+
+    dedup = dedup_for(options)
+    if dedup is not None:
+        with report.timed("dedup", rows=len(cleaned_data)):
+            cleaned_data = dedup.filter(cleaned_data)
+        dedup.close()
+        report.stage("duplicates").rows = dedup.duplicates
+
     print("\n--- Preview of Cleaned Data ---")
     for item in cleaned_data[:2]: # Print first 2 for check
         print(item)
     print("-------------------------------\n")
 
     # 3. LOAD (Choose one or both!)
-    
+
     # ----- Load to SQL -----
-    # load_to_sql(cleaned_data, SQL_DB_PATH)
-    
+    # with report.timed("load") as load:
+    #     load.rows = load_to_sql(cleaned_data, SQL_DB_PATH, mode=sql_mode_for(options), key=options.key,
+    #                             profile=options.sql_profile, writers=options.writers)
+
     # ----- Load to MongoDB -----
     # Uncomment below if you have Mongo running locally
-    load_to_mongo(cleaned_data)
+    with report.timed("load") as load:
+        load.rows = load_to_mongo(cleaned_data, batch_size=options.batch_size, ordered=options.ordered,
+                                  client=mongo_client, upsert=options.upsert, key=options.key,
+                                  writers=options.writers)
+
+    # ----- Export to Parquet / Arrow (--export DIR) -----
+    if options.export_dir:
+        from scripts.columnar_sink import load_to_columnar
+        with report.timed(f"load:{options.export_format}") as export:
+            export.rows = load_to_columnar(cleaned_data, options.export_dir, options.export_format)
+
+    # ----- Summary table (--aggregate) -----
+    if options.aggregate and load.rows:
+        from scripts.aggregate import Aggregator, write_summary
+        aggregator = Aggregator()
+        with report.timed("aggregate", rows=len(cleaned_data)):
+            aggregator.update(cleaned_data)
+        # Upserts overwrite existing rows, so their statistics can't just be added
+        write_summary(aggregator, SQL_DB_PATH, merge=not options.upsert)
+
+    print("\n=== Pipeline Finished Successfully ===")
+
+def run_streaming_pipeline(options, mongo_client=None, report=None, quarantine=None):
+    """Chains extract -> transform -> load as generators, so only one batch is in memory.
+
+    Every committed batch of a plain CSV is checkpointed, so --resume continues a
+    crashed load; compressed input is streamed without checkpoints.
+    """
+    from scripts.checkpoint import Checkpoint, checkpointed
+    from scripts.incremental import iter_csv_range
+
+    print(f"Streaming mode: batch size {options.batch_size}")
+    report = report or RunReport("stream")
+    if not os.path.exists(CSV_PATH):
+        print(f"Error: File not found at {CSV_PATH}")
+        print("Pipeline aborted due to missing data.")
+        return
+
+    # Checkpoints are byte offsets into the plain CSV, which a compressed stream doesn't have
+    compressed = detect_compression(CSV_PATH)
+    if compressed and options.resume:
+        print(f"Error: {CSV_PATH} is {compressed}-compressed; --resume needs the plain CSV.")
+        print("Pipeline aborted.")
+        return
+
+    # 1. EXTRACT + 2. TRANSFORM (lazy, nothing is read yet)
+    state = None
+    start = 0
+    progress = {}
+    aggregator = None
+    if compressed:
+        print(f"{CSV_PATH} is {compressed}-compressed: streaming it without checkpoints.")
+        records = iter_csv(CSV_PATH, options.read_ahead, schema_for(options))
+        batches = metered_batches(records, options, report, quarantine, dedup_for(options))
+    else:
+        checkpoint = Checkpoint(options.checkpoint_path, CSV_PATH)
+        state = checkpoint.resume_state() if options.resume else None
+        start = state["offset"] if state else 0
+        snapshot = None
+        if options.aggregate:
+            # The summary must cover the rows loaded before a crash too, so the
+            # aggregator is saved with every checkpoint and restored on --resume
+            from scripts.aggregate import Aggregator
+            if state and "aggregates" not in state:
+                print("Error: the checkpoint was saved without --aggregate, so the summary of the rows "
+                      "before it is unknown. Resume without --aggregate, or start over.")
+                print("Pipeline aborted.")
+                return
+            aggregator = Aggregator.from_dict(state["aggregates"]) if state else Aggregator()
+            snapshot = lambda: {"aggregates": aggregator.to_dict()}
+        dedup = dedup_for(options)
+        if dedup is not None and start:
+            replay_dedup(dedup, options, start)
+        records = iter_csv_range(CSV_PATH, start, os.path.getsize(CSV_PATH), progress, schema_for(options))
+        batches = metered_batches(records, options, report, quarantine, dedup)
+        batches = checkpointed(batches, checkpoint, progress, state, quarantine, snapshot)
+    batches = report.meter_load(summarized(exported(batches, options, report), options, report,
+                                           merge=not options.upsert, aggregator=aggregator))
+
+    # 3. LOAD (Choose one!) - each sink pulls batches as it writes them
 
+    # ----- Load to SQL -----
+    # total = stream_to_sql(batches, SQL_DB_PATH, mode=sql_mode_for(options), key=options.key,
+    #                       profile=options.sql_profile)
+
+    # ----- Load to MongoDB -----
+    total = stream_to_mongo(batches, ordered=options.ordered, client=mongo_client, upsert=options.upsert,
+                            key=options.key)
+
+    # ----- Load to Parquet / Arrow only (or pass --export DIR to write it alongside) -----
+    # from scripts.columnar_sink import stream_to_columnar
+    # total = stream_to_columnar(batches, os.path.join(BASE_DIR, "output", "students"))
+    if total:
+        report.stage("extract").bytes = progress["offset"] - start if progress else os.path.getsize(CSV_PATH)
+
+    if not total and not state:
+        print("Pipeline aborted due to missing data.")
+        return
+    print("\n=== Pipeline Finished Successfully ===")
+
+def run_fanout_pipeline(options, mongo_client=None, report=None, quarantine=None):
+    """Streams batches to SQL and Mongo at the same time (asyncio + bounded queues)."""
+    from scripts.fanout import load_fan_out, SQLSink, MongoSink
+
+    report = report or RunReport("fanout")
+    records = iter_csv(CSV_PATH, options.read_ahead, schema_for(options))
+    batches = metered_batches(records, options, report, quarantine, dedup_for(options))
+    batches = summarized(batches, options, report, merge=not options.upsert)
+    sinks = [
+        SQLSink(SQL_DB_PATH, mode=sql_mode_for(options), key=options.key, profile=options.sql_profile),
+        MongoSink(mongo_client, ordered=options.ordered, upsert=options.upsert, key=options.key),
+    ]
+    if options.export_dir:
+        from scripts.columnar_sink import ColumnarSink
+        sinks.append(ColumnarSink(options.export_dir, options.export_format))
+    stats = load_fan_out(batches, sinks, options.queue_size, report)
+
+    if not any(sink_stats["rows"] for sink_stats in stats.values()):
+        print("Pipeline aborted due to missing data.")
+        return
+    report.stage("extract").bytes = os.path.getsize(CSV_PATH)
     print("\n=== Pipeline Finished Successfully ===")
 
+def run_sharded_pipeline(options, mongo_client=None, report=None, quarantine=None):
+    """Parses every CSV shard of --input in a process pool and streams the merged rows into one sink."""
+    from scripts.shards import expand_inputs, iter_shards, shard_batches
+    from scripts.dedup import deduplicated
+
+    report = report or RunReport("sharded")
+    paths = expand_inputs(options.input_path, exclude=[options.rejects_path])
+    if not paths:
+        print(f"Error: No CSV files match {options.input_path}")
+        print("Pipeline aborted due to missing data.")
+        return
+    print(f"Sharded mode: {len(paths)} files, {options.workers} worker{'s' if options.workers != 1 else ''}")
+
+    # 1. EXTRACT + 2. TRANSFORM (in the workers, one whole shard at a time)
+    schema = schema_for(options, paths[0])  # shards of one drop share their columns
+    shards = iter_shards(paths, options.workers, rules_for(options), options.read_ahead, schema)
+    batches = shard_batches(shards, options.batch_size, report, quarantine)
+    batches = deduplicated(batches, dedup_for(options), report)
+    batches = report.meter_load(summarized(exported(batches, options, report), options, report,
+                                           merge=not options.upsert))
+
+    # 3. LOAD (Choose one!)
+
+    # ----- Load to SQL -----
+    # total = stream_to_sql(batches, SQL_DB_PATH, mode=sql_mode_for(options), key=options.key,
+    #                       profile=options.sql_profile, writers=options.writers)
+
+    # ----- Load to MongoDB -----
+    total = stream_to_mongo(batches, ordered=options.ordered, client=mongo_client, upsert=options.upsert,
+                            key=options.key, writers=options.writers)
+
+    if not total:
+        print("Pipeline aborted due to missing data.")
+        return
+    print("\n=== Pipeline Finished Successfully ===")
+
+def run_incremental_pipeline(options, mongo_client=None, report=None, quarantine=None):
+    """Streams only the rows appended since the last successful run, then moves the high-water mark.
+
+    Always upserts: after a rewrite the whole file is re-read and must not duplicate rows.
+    """
+    from scripts.incremental import plan_increment, iter_csv_range, save_state
+
+    report = report or RunReport("incremental")
+    start, end = plan_increment(CSV_PATH, SQL_DB_PATH)
+    if start >= end:
+        print("No new rows since the last run.")
+        print("\n=== Pipeline Finished Successfully ===")
+        return
+
+    progress = {}
+    dedup = dedup_for(options)
+    records = iter_csv_range(CSV_PATH, start, end, progress, schema_for(options))
+    batches = metered_batches(records, options, report, quarantine, dedup)
+    # Appended rows add to the stored summary; a full reload (start == 0) replaces it
+    batches = report.meter_load(summarized(exported(batches, options, report), options, report, merge=start > 0))
+
+    # 3. LOAD (Choose one!) - with raise_errors=True, so a failed load never moves the mark,
+    # whatever the row counts say (Mongo down before the first batch: 0 of 0 rows loaded)
+    try:
+        # ----- Load to SQL -----
+        # total = stream_to_sql(batches, SQL_DB_PATH, mode="upsert", key=options.key, writers=options.writers,
+        #                       raise_errors=True)
+
+        # ----- Load to MongoDB -----
+        total = stream_to_mongo(batches, ordered=options.ordered, client=mongo_client, upsert=True,
+                                key=options.key, writers=options.writers, raise_errors=True)
+    except Exception:
+        print("The load failed; keeping the old high-water mark.")
+        return
+    report.stage("extract").bytes = end - start
+
+    # Only move the mark if every extracted row reached the sink (or the quarantine file, or was a duplicate)
+    rejected = quarantine.rows if quarantine is not None else 0
+    duplicates = dedup.duplicates if dedup is not None else 0
+    if total + rejected + duplicates != progress.get("rows", 0):
+        print(f"Loaded {total} (+{rejected} quarantined, {duplicates} duplicates) of {progress.get('rows', 0)} "
+              "new rows; keeping the old high-water mark.")
+        return
+    save_state(CSV_PATH, end, total, SQL_DB_PATH)
+    print("\n=== Pipeline Finished Successfully ===")
+
+def run_dag_pipeline(options):
+    """Runs the stages wired in a pipeline file (scripts/dag.py) instead of the built-in modes."""
+    from scripts.dag import run_config
+
+    report = RunReport(run_mode(options))
+    try:
+        stats = run_config(options.config_path, report)
+    finally:
+        write_report(report.finish(), options)
+    if any(stage_stats["error"] for stage_stats in stats.values()):
+        print("\n=== Pipeline Finished With Errors ===")
+        return
+    print("\n=== Pipeline Finished Successfully ===")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mini-ETL pipeline: CSV -> SQLite / MongoDB")
+    parser.add_argument("--config", metavar="PIPELINE_FILE",
+                        help="run the stages wired in a TOML/YAML pipeline file (e.g. pipeline.toml)")
+    parser.add_argument("--input", metavar="PATH",
+                        help="read a directory or glob of CSV shards (e.g. 'drops/2024-*/*.csv.gz') "
+                             "in --workers processes instead of data/students.csv")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the CSV as a stream of batches instead of loading it all")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue a crashed streaming load from its last checkpoint (implies --stream)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"rows per batch (stream chunks and Mongo insert_many calls, default {BATCH_SIZE})")
+    parser.add_argument("--sql-mode", choices=SQL_LOAD_MODES, default="core",
+                        help="how rows are inserted into SQLite (see scripts/bench_sql_load.py)")
+    parser.add_argument("--sql-profile", choices=SQLITE_PROFILES, default="default",
+                        help="SQLite connection tuning: bulk = WAL, synchronous=NORMAL, 256 MiB cache and "
+                             "secondary indexes rebuilt after the load; bulk-unsafe also skips fsync")
+    parser.add_argument("--unordered", action="store_true",
+                        help="use insert_many(ordered=False) so Mongo applies each batch in parallel")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used by clean_data, the mmap reader and --input shards (default 1)")
+    parser.add_argument("--reader", choices=READ_BACKENDS, default="csv",
+                        help="CSV reader for the row engine: csv.DictReader or memory-mapped parallel tuples")
+    parser.add_argument("--csv-cache", action="store_true",
+                        help="batch mode: reuse a Parquet copy of the CSV while it is unchanged (needs pyarrow)")
+    parser.add_argument("--read-ahead", action="store_true",
+                        help="compressed CSV (gzip/bz2/xz/zstd): decompress in a background thread while parsing")
+    parser.add_argument("--typed", action="store_true",
+                        help="row engine: infer the types of the number columns from a sample and convert "
+                             "values while parsing (name and city always stay text)")
+    parser.add_argument("--schema", metavar="COLUMN=TYPE", action="append",
+                        help="column type (int, float or str) that wins over the inferred one; implies --typed")
+    parser.add_argument("--engine", choices=("row", "columnar"), default="row",
+                        help="transform engine for batch mode: per-row dicts or vectorized pandas")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only load rows appended to the CSV since the last successful run")
+    parser.add_argument("--upsert", action="store_true",
+                        help="upsert on the natural key (--key) so reruns don't duplicate students")
+    parser.add_argument("--key", default=",".join(NATURAL_KEY), metavar="COLUMNS",
+                        help="comma-separated columns that identify a student for --upsert / --incremental "
+                             f"(default: the whole row, {','.join(NATURAL_KEY)}: reloads skip loaded rows; "
+                             "e.g. name,city to update changed marks where that pair is unique)")
+    parser.add_argument("--drop-key-duplicates", action="store_true",
+                        help="before loading, delete all but the newest of the stored rows / documents that "
+                             "share a --key, so its unique index can be built")
+    parser.add_argument("--fanout", action="store_true",
+                        help="stream into SQL and Mongo concurrently instead of one sink")
+    parser.add_argument("--writers", type=int, default=1,
+                        help="concurrent SQL connections / Mongo insert_many calls per load (not with --stream, "
+                             "whose checkpoints need batches committed in order; Mongo upserts use one)")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="batches each fan-out sink may fall behind before the reader waits")
+    parser.add_argument("--report", metavar="PATH",
+                        help="where to write the JSON run report (default: reports/run_<timestamp>.json)")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="also write the run metrics in Prometheus text format to PATH")
+    parser.add_argument("--export", metavar="DIR",
+                        help="also write the cleaned rows to DIR as a dataset partitioned by city")
+    parser.add_argument("--export-format", choices=COLUMNAR_FORMATS, default="parquet",
+                        help="file format of the --export dataset (Arrow IPC or Parquet, default parquet)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="drop repeated rows (same normalized name, city and marks) before loading")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="compute per-city count/sum/min/max/mean/p50/p90/p99 of marks while loading "
+                             "and store them in the aggregates table of school.db")
+    parser.add_argument("--profile", nargs="?", const="sample", choices=PROFILERS, metavar="PROFILER",
+                        help="profile the run: sample (default, low overhead, collapsed stacks per stage for "
+                             "flamegraphs plus a sampled run.pstats) or cprofile (deterministic run.pstats "
+                             "only); written to profiles/run_<timestamp>/")
+    parser.add_argument("--rejects", metavar="PATH", default=REJECTS_PATH,
+                        help="CSV file that receives rows failing validation, with the reasons "
+                             "(appended to by --resume and --incremental runs)")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="skip validation: bad marks become 0 with a warning per row (old behaviour)")
+    args = parser.parse_args()
+    try:
+        schema_overrides = parse_overrides(args.schema)
+        key = parse_key(args.key)
+    except ValueError as e:
+        parser.error(str(e))
+    return PipelineOptions(
+        stream=args.stream or args.resume, resume=args.resume, batch_size=args.batch_size, sql_mode=args.sql_mode,
+        sql_profile=args.sql_profile,
+        ordered=not args.unordered, workers=args.workers, reader=args.reader,
+        csv_cache=args.csv_cache, read_ahead=args.read_ahead, engine=args.engine,
+        typed=args.typed, schema_overrides=schema_overrides,
+        incremental=args.incremental, upsert=args.upsert, key=key, drop_key_duplicates=args.drop_key_duplicates,
+        fanout=args.fanout, queue_size=args.queue_size, writers=args.writers,
+        report_path=args.report, prometheus_path=args.prometheus,
+        export_dir=args.export, export_format=args.export_format, aggregate=args.aggregate,
+        dedup=args.dedup,
+        validate=not args.no_validate, rejects_path=args.rejects,
+        config_path=args.config, input_path=args.input, profiler=args.profile,
+    )
+
 if __name__ == "__main__":
     # Ensure requirements are installed:
     # pip install sqlalchemy pymongo
-    run_pipeline()
\ No newline at end of file
+    options = parse_args()
+    if options.profiler:
+        profile_run(run_pipeline, options, profiler=options.profiler, directory=PROFILES_DIR)
+    else:
+        run_pipeline(options)
@@ -0,0 +1,263 @@
+"""Pre-aggregation stage: per-group count / sum / min / max / mean / percentiles in one pass.
+
+The Aggregator sees every cleaned batch on its way to the sink (streaming
+group-by: one small state object per group, nothing per row is kept) and,
+once the load is done, write_summary stores one row per group in the
+`aggregates` table of the SQL database:
+
+    SELECT group_value, count, mean, p50, p90 FROM aggregates
+    WHERE measure = 'marks' AND group_by = 'city';
+
+Percentiles come from a t-digest per group (about a hundred centroids, see
+TDigest), so they are approximate but need no second scan. The centroids are
+stored with the summary, which lets a later run that only appends rows merge
+into it (merge=True) so the table keeps describing all loaded rows. Runs
+that replace or upsert rows write their own summary instead (merge=False).
+A resumable streaming load saves the Aggregator (to_dict) with every
+checkpoint, so `--resume` picks up the groups of the rows loaded before the crash.
+"""
+import json
+import math
+import time
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, Column, Integer, Float, String, Text, DateTime
+from sqlalchemy.orm import sessionmaker
+from scripts.loader import Base
+
+TDIGEST_COMPRESSION = 100
+BUFFER_FACTOR = 5
+PERCENTILES = (0.5, 0.9, 0.99)
+
+class TDigest:
+    """Merging t-digest (Dunning & Ertl): approximate quantiles from a stream in bounded memory.
+
+    Values are buffered and merged into at most ~compression centroids; the
+    arcsine scale function keeps the centroids near both tails small, so the
+    extreme percentiles stay accurate.
+    """
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.centroids = []  # sorted [mean, weight] pairs
+        self.buffer = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        self.buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self.buffer) >= BUFFER_FACTOR * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        for mean, weight in other.centroids:
+            self.add(mean, weight)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q_limit(self, q):
+        k = self._k(q) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted([tuple(c) for c in self.centroids] + self.buffer)
+        self.buffer = []
+        total = self.count
+        merged = []
+        q0 = 0.0
+        limit = self._q_limit(q0)
+        mean, weight = points[0]
+        for point_mean, point_weight in points[1:]:
+            if q0 + (weight + point_weight) / total <= limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append([mean, weight])
+                q0 += weight / total
+                limit = self._q_limit(q0)
+                mean, weight = point_mean, point_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Value below which a share q (0..1) of the values fall; None if empty."""
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * self.count
+        # Each centroid's weight is centred on its mean; interpolate between neighbouring centres
+        previous_center, previous_mean = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                return previous_mean + (mean - previous_mean) * ((target - previous_center) / span if span else 0)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = self.count - previous_center
+        return previous_mean + (self.max - previous_mean) * ((target - previous_center) / span if span else 0)
+
+    def to_dict(self):
+        self._compress()
+        return {"compression": self.compression, "centroids": self.centroids, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.centroids = [list(c) for c in data["centroids"]]
+        digest.count = sum(weight for _, weight in digest.centroids)
+        digest.min, digest.max = data["min"], data["max"]
+        return digest
+
+class GroupStats:
+    """Running aggregates of one group."""
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.count = 0
+        self.total = 0
+        self.digest = TDigest(compression)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.digest.add(value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.digest.merge(other.digest)
+
+class Aggregator:
+    """Streaming group-by of `measure` per `group_by` value over batches of cleaned rows."""
+
+    def __init__(self, group_by="city", measure="marks", compression=TDIGEST_COMPRESSION):
+        self.group_by = group_by
+        self.measure = measure
+        self.compression = compression
+        self.groups = {}
+
+    def update(self, batch):
+        groups = self.groups
+        for row in batch:
+            value = row.get(self.measure)
+            if not isinstance(value, (int, float)):
+                continue  # only cleaned, numeric values count
+            key = row.get(self.group_by)
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = GroupStats(self.compression)
+            stats.add(value)
+        return batch
+
+    def to_dict(self):
+        """JSON-ready state (group keys may be None, so groups are [key, stats] pairs)."""
+        return {
+            "group_by": self.group_by, "measure": self.measure, "compression": self.compression,
+            "groups": [[key, {"count": stats.count, "total": stats.total, "digest": stats.digest.to_dict()}]
+                       for key, stats in self.groups.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregator = cls(data["group_by"], data["measure"], data["compression"])
+        for key, saved in data["groups"]:
+            stats = aggregator.groups[key] = GroupStats(aggregator.compression)
+            stats.count, stats.total = saved["count"], saved["total"]
+            stats.digest = TDigest.from_dict(saved["digest"])
+        return aggregator
+
+    def rows(self):
+        """One dict per group: count, sum, min, max, mean and the PERCENTILES (as p50, p90, ...)."""
+        for key, stats in sorted(self.groups.items(), key=lambda item: str(item[0])):
+            row = {
+                "group_value": key, "count": stats.count, "sum": stats.total,
+                "min": stats.digest.min, "max": stats.digest.max, "mean": stats.total / stats.count,
+            }
+            row.update({f"p{round(q * 100)}": stats.digest.quantile(q) for q in PERCENTILES})
+            yield row
+
+def aggregated(batches, aggregator, report=None):
+    """Updates the aggregator with every batch on its way to the sink."""
+    stats = report.stage("aggregate") if report else None
+    for batch in batches:
+        start = time.perf_counter()
+        aggregator.update(batch)
+        if stats:
+            stats.seconds += time.perf_counter() - start
+            stats.rows += len(batch)
+        yield batch
+
+# --- SUMMARY TABLE ---
+class AggregateRow(Base):
+    __tablename__ = "aggregates"
+    measure = Column(String, primary_key=True)
+    group_by = Column(String, primary_key=True)
+    group_value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float)
+    max = Column(Float)
+    mean = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    p99 = Column(Float)
+    digest = Column(Text)  # t-digest centroids as JSON, for merging the next run in
+    updated_at = Column(DateTime)
+
+def write_summary(aggregator, db_name="school.db", merge=True):
+    """Stores the aggregator's groups in the aggregates table; returns the number of groups written.
+
+    merge=True adds this run's rows to the stored summary (append-only
+    loads); merge=False replaces the summary of this measure / group_by.
+    """
+    engine = create_engine(f"sqlite:///{db_name}")
+    Base.metadata.create_all(engine, tables=[AggregateRow.__table__])
+    session = sessionmaker(bind=engine)()
+    try:
+        stored = session.query(AggregateRow).filter_by(measure=aggregator.measure, group_by=aggregator.group_by)
+        if merge:
+            for previous in stored:
+                stats = GroupStats(aggregator.compression)
+                stats.count, stats.total = previous.count, previous.sum
+                stats.digest = TDigest.from_dict(json.loads(previous.digest))
+                current = aggregator.groups.get(previous.group_value)
+                if current is not None:
+                    stats.merge(current)
+                aggregator.groups[previous.group_value] = stats
+        stored.delete()
+        now = datetime.now(timezone.utc)
+        written = 0
+        for row in aggregator.rows():
+            digest = aggregator.groups[row["group_value"]].digest
+            session.add(AggregateRow(
+                measure=aggregator.measure, group_by=aggregator.group_by,
+                group_value=str(row.pop("group_value")), digest=json.dumps(digest.to_dict()),
+                updated_at=now, **row,
+            ))
+            written += 1
+        session.commit()
+        print(f"Wrote {aggregator.measure} summary for {written} {aggregator.group_by} groups "
+              f"to {db_name} (aggregates table{', merged' if merge else ''}).")
+        return written
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        engine.dispose()
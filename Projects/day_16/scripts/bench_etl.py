@@ -0,0 +1,175 @@
+"""End-to-end stage benchmark: read_csv, clean_data, load_to_sql, load_to_mongo.
+
+For every row count a synthetic students.csv is generated (scripts/synth.py,
+same seed = same file on every commit) and each stage is timed in turn.
+Every row count runs in a fresh worker process, so the peak RSS growth of a
+stage is not hidden by a bigger run before it. The Mongo stage is skipped if
+no server answers at MONGO_URI.
+
+Results are saved as bench_results/<git commit>.json; pass an older file to
+--compare to see the change per stage.
+
+Run from the day_16 folder:
+    python -m scripts.bench_etl                                    # 10k, 100k, 1M rows
+    python -m scripts.bench_etl --rows 10000 10000000 --stages read clean sql
+    python -m scripts.bench_etl --stages read clean --reader mmap --workers 4
+    python -m scripts.bench_etl --compare bench_results/abc1234.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from scripts.loader import read_csv, clean_data, load_to_sql, load_to_mongo, MONGO_URI, READ_BACKENDS
+from scripts.metrics import peak_rss_bytes
+from scripts.synth import write_students_csv, BASE_CITIES
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+STAGES = ("read", "clean", "sql", "mongo")
+MONGO_BENCH_COLLECTION = "students_bench"
+
+def git_commit():
+    """Short hash of HEAD (with -dirty for uncommitted changes), or "unknown" outside git."""
+    try:
+        head = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no", "."], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{head}-dirty" if dirty else head
+
+def mongo_client_or_none():
+    """A client if a Mongo server answers within 2s, else None."""
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+        return client
+    except PyMongoError:
+        client.close()
+        return None
+
+def measure(stage, rows, func, *args):
+    """Runs one stage with its prints silenced; returns (result, stats dict)."""
+    rss_before = peak_rss_bytes()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    rss_after = peak_rss_bytes()
+    return result, {
+        "stage": stage,
+        "rows": rows,
+        "seconds": round(elapsed, 6),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "peak_rss_bytes": rss_after,
+        "rss_growth_bytes": rss_after - rss_before if rss_after is not None else None,
+    }
+
+def run_size(n, stages, dirty_ratio, cities, seed, reader="csv", workers=1):
+    """Benchmarks every requested stage for n rows (called in a fresh worker process)."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_students_csv(os.path.join(tmp, "students.csv"), n, dirty_ratio, cities, seed)
+
+        raw, stats = measure("read", n, read_csv, csv_path, reader, workers)
+        stats["bytes"] = os.path.getsize(csv_path)
+        results.append(stats)
+        cleaned, stats = measure("clean", n, clean_data, raw)
+        results.append(stats)
+        del raw
+
+        if "sql" in stages:
+            _, stats = measure("sql", n, load_to_sql, cleaned, os.path.join(tmp, "bench.db"), "core")
+            results.append(stats)
+
+        if "mongo" in stages:
+            client = mongo_client_or_none()
+            if client is None:
+                print(f"  {n:,} rows: no Mongo server at {MONGO_URI}, skipping the mongo stage.")
+            else:
+                try:
+                    client.school.drop_collection(MONGO_BENCH_COLLECTION)
+                    _, stats = measure("mongo", n, load_to_mongo, cleaned, MONGO_URI, "school",
+                                       MONGO_BENCH_COLLECTION, 1000, False, client)
+                    results.append(stats)
+                finally:
+                    client.school.drop_collection(MONGO_BENCH_COLLECTION)
+                    client.close()
+    # read and clean always run (the loaders need their output); only report the ones asked for
+    return [stats for stats in results if stats["stage"] in stages]
+
+def print_results(results, baseline=None):
+    """Prints the result table; with a baseline adds the rows/sec change per (rows, stage)."""
+    previous = {(r["rows"], r["stage"]): r for r in (baseline or {}).get("results", [])}
+    header = f"{'rows':>12} {'stage':>6} {'seconds':>9} {'rows/sec':>12} {'RSS +MiB':>9}"
+    print(header + (f" {'vs base':>8}" if baseline else ""))
+    for r in results:
+        growth = f"{r['rss_growth_bytes'] / 2**20:.1f}" if r["rss_growth_bytes"] is not None else "n/a"
+        line = f"{r['rows']:>12,} {r['stage']:>6} {r['seconds']:>9.3f} {r['rows_per_sec'] or 0:>12,.0f} {growth:>9}"
+        base = previous.get((r["rows"], r["stage"]))
+        if base and base["rows_per_sec"] and r["rows_per_sec"]:
+            line += f" {(r['rows_per_sec'] / base['rows_per_sec'] - 1) * 100:>+7.1f}%"
+        elif baseline:
+            line += f" {'-':>8}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--dirty-ratio", type=float, default=0.05,
+                        help="share of rows with messy text and invalid marks (default 0.05)")
+    parser.add_argument("--cities", type=int, default=len(BASE_CITIES),
+                        help=f"number of distinct cities (default {len(BASE_CITIES)})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reader", choices=READ_BACKENDS, default="csv", help="read_csv backend")
+    parser.add_argument("--workers", type=int, default=1, help="processes for the mmap reader")
+    parser.add_argument("--output", help="results file (default: bench_results/<git commit>.json)")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.rows:
+        print(f"Benchmarking {n:,} rows ({', '.join(args.stages)})...")
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results += pool.submit(run_size, n, args.stages, args.dirty_ratio, args.cities, args.seed,
+                                   args.reader, args.workers).result()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "params": {"dirty_ratio": args.dirty_ratio, "cities": args.cities, "seed": args.seed,
+                   "reader": args.reader, "workers": args.workers},
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"\n=== ETL stage benchmark ({commit}) ===")
+    if baseline:
+        print(f"Compared with {baseline.get('commit', args.compare)}")
+        if baseline.get("params") != report["params"]:
+            print(f"Warning: baseline was generated with different params {baseline.get('params')}")
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark for load_to_sql: ORM vs Core vs raw sqlite3 inserts, per SQLite profile.
+
+Run from the day_16 folder:
+    python -m scripts.bench_sql_load                      # 10k, 1M, 10M rows
+    python -m scripts.bench_sql_load --rows 10000 --modes core sqlite3
+    python -m scripts.bench_sql_load --rows 1000000 --modes core --profiles default bulk --index
+    python -m scripts.bench_sql_load --rows 1000000 --modes core --writers 1 4   # staged parallel writers
+
+--index puts a secondary index on students(city) before loading, the way a
+real schema would; the bulk profiles drop it for the load and rebuild it once.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from scripts.loader import load_to_sql, make_engine, Base, SQL_LOAD_MODES, SQL_CHUNK_SIZE, SQLITE_PROFILES
+
+CITIES = ["Munger", "Belgaum", "Pallavaram", "Tiruchirappalli", "Pune", "Delhi"]
+
+def make_rows(n, seed=42):
+    """Builds n already-cleaned student rows (same shape as clean_data output)."""
+    rng = random.Random(seed)
+    return [
+        {"name": f"Student{i}", "marks": rng.randint(0, 100), "city": rng.choice(CITIES)}
+        for i in range(n)
+    ]
+
+def create_index(db_path):
+    engine = make_engine(db_path)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE INDEX ix_students_city ON students (city)")
+    engine.dispose()
+
+def bench(rows, mode, chunk_size, profile="default", index=False, writers=1):
+    """Loads rows into a fresh temp database and returns rows/sec."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        if index:
+            create_index(db_path)
+        start = time.perf_counter()
+        loaded = load_to_sql(rows, db_path, mode=mode, chunk_size=chunk_size, profile=profile, writers=writers)
+        elapsed = time.perf_counter() - start
+    return loaded / elapsed if elapsed else 0.0, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQL load modes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--modes", nargs="+", choices=SQL_LOAD_MODES, default=list(SQL_LOAD_MODES))
+    parser.add_argument("--chunk-size", type=int, default=SQL_CHUNK_SIZE)
+    parser.add_argument("--profiles", nargs="+", choices=SQLITE_PROFILES, default=["default"])
+    parser.add_argument("--index", action="store_true", help="load into a table with an index on city")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1], help="concurrent writer counts to compare")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.rows:
+        rows = make_rows(n)
+        for mode in args.modes:
+            baseline = None
+            for profile in args.profiles:
+                for writers in args.writers:
+                    rate, elapsed = bench(rows, mode, args.chunk_size, profile, args.index, writers)
+                    baseline = baseline or elapsed
+                    results.append((n, mode, profile, writers, elapsed, rate,
+                                    baseline / elapsed if elapsed else 0.0))
+
+    print(f"\n=== SQL load benchmark{' (indexed table)' if args.index else ''} ===")
+    print(f"{'rows':>12} {'mode':>8} {'profile':>12} {'writers':>8} {'seconds':>10} {'rows/sec':>14} {'speedup':>8}")
+    for n, mode, profile, writers, elapsed, rate, speedup in results:
+        print(f"{n:>12,} {mode:>8} {profile:>12} {writers:>8} {elapsed:>10.2f} {rate:>14,.0f} {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Parity check + benchmark: row engine (read_csv/clean_data) vs columnar (pandas).
+
+rows/sec covers read + clean; the to-dicts column is the extra cost of handing
+columnar results to the row-based loaders. Before timing anything, both
+engines also validate and clean a small dirty file (short and long rows, bad
+marks including non-ASCII digits, blanks) and must keep exactly the same rows, and typed reads
+(scripts/schema.py) of a dirty synthetic file must clean to the same rows as
+untyped ones.
+
+Run from the day_16 folder:
+    python -m scripts.bench_transform                  # 100k and 1M rows
+    python -m scripts.bench_transform --rows 10000
+"""
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+from scripts.loader import read_csv, clean_data
+from scripts.columnar import read_csv_columnar, clean_frame, clean_data_columnar
+from scripts.schema import infer_schema
+from scripts.synth import write_students_csv
+from scripts.validation import RULES
+
+DIRTY_CSV = """name,marks,city
+  asha ,80, pune
+Dan,90
+Eve,7.5,Goa
+Bob,70,Delhi,extra
+,55,Agra
+Ravi, 12 ,DELHI
+Meera,,Pune
+Kiran,-3,
+Zara,٣,Pune
+Omar,1_000,Goa
+"""
+
+def timed(func, *args):
+    # Silence per-row warnings so we time the transform, not the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+def check_dirty_parity():
+    """Both engines must keep (and clean) the same rows of DIRTY_CSV when validating."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dirty.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(DIRTY_CSV)
+        row_result, _ = timed(lambda: clean_data(read_csv(path), rules=RULES))
+        col_result, _ = timed(lambda: clean_data_columnar(read_csv_columnar(path), rules=RULES))
+    assert row_result == col_result, f"engines differ on dirty rows: {row_result} != {col_result}"
+    print(f"Dirty-file parity check passed: both engines kept the same {len(row_result)} rows.")
+
+def check_typed_parity(rows=3000, dirty_ratio=0.1):
+    """Typed reads of a dirty synthetic file keep and clean the same rows as untyped reads."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_students_csv(os.path.join(tmp, "students.csv"), rows, dirty_ratio=dirty_ratio)
+        inferred, _ = timed(infer_schema, path)
+        assert inferred["marks"] == "int", f"marks inferred as {inferred['marks']}, its rule says int"
+        floats, _ = timed(lambda: infer_schema(path, overrides={"marks": "float"}))
+        for rules in (RULES, None):
+            plain, _ = timed(lambda: clean_data(read_csv(path), rules=rules))
+            for schema in (inferred, floats):
+                typed, _ = timed(lambda: clean_data(read_csv(path, schema=schema), rules=rules))
+                assert typed == plain, f"typed read ({schema}, rules={bool(rules)}) cleans differently"
+        # Text columns stay str even if every value is a number (PIN codes as cities)
+        numeric = os.path.join(tmp, "numeric_city.csv")
+        with open(numeric, "w", encoding="utf-8") as f:
+            f.write("name,marks,city\nBob,70,110001\nAsha,80,400001\n")
+        schema, _ = timed(infer_schema, numeric)
+        typed, _ = timed(lambda: clean_data(read_csv(numeric, schema=schema), rules=RULES))
+        plain, _ = timed(lambda: clean_data(read_csv(numeric), rules=RULES))
+        assert typed == plain, f"typed read of a numeric city column cleans differently: {typed}"
+    print(f"Typed-read check passed: {rows} rows with {dirty_ratio:.0%} dirty clean the same typed and untyped.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Row vs columnar transform benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    check_dirty_parity()
+    check_typed_parity()
+    print(f"{'rows':>12} {'engine':>9} {'read s':>8} {'clean s':>8} {'to dicts s':>10} {'rows/sec':>12}")
+    for n in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "students.csv")
+            write_students_csv(path, n)
+
+            raw, row_read = timed(read_csv, path)
+            row_result, row_clean = timed(clean_data, raw)
+            df, col_read = timed(read_csv_columnar, path)
+            frame, col_clean = timed(clean_frame, df)
+            # Row sinks need dicts; columnar sinks can take the frame as is
+            col_result, col_convert = timed(frame.to_dict, "records")
+
+        # Parity: the columnar engine must give exactly the same records
+        assert row_result == col_result, "columnar engine output differs from row engine"
+
+        for engine, read_s, clean_s, convert_s in (("row", row_read, row_clean, 0.0),
+                                                   ("columnar", col_read, col_clean, col_convert)):
+            print(f"{n:>12,} {engine:>9} {read_s:>8.2f} {clean_s:>8.2f} {convert_s:>10.2f} "
+                  f"{n / (read_s + clean_s):>12,.0f}")
+    print("Parity check passed: both engines returned identical records.")
+
+if __name__ == "__main__":
+    main()
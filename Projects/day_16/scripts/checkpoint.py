@@ -0,0 +1,85 @@
+"""Checkpoints for resumable streaming loads.
+
+Each batch is committed on its own (stream_to_sql / stream_to_mongo), and after
+each commit the checkpoint file records how far the load got: the byte
+offset in the CSV just after the batch's last row, plus batch and row
+counts. `main.py --stream --resume` starts reading at that offset instead
+of at the beginning. The checkpoint is deleted once the whole file is loaded.
+
+Stages that keep state across batches (the --aggregate Aggregator) can add
+it to every save through checkpointed's snapshot, and get it back from the
+resume state. The --dedup key set can be far too big for that; it is
+rebuilt on resume by reading the rows before the checkpoint again
+(main.replay_dedup).
+
+A checkpoint only applies to the file it was written for: if the CSV was
+rewritten since (its fingerprint up to the offset changed), the load starts over.
+
+A crash between a batch's commit and its checkpoint save loads that one
+batch twice on resume; use --upsert to make that harmless.
+"""
+import os
+import json
+from datetime import datetime, timezone
+from scripts.incremental import fingerprint
+
+class Checkpoint:
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def resume_state(self):
+        """The saved state for this source, or None if there is nothing (valid) to resume."""
+        if not os.path.exists(self.path):
+            print("No checkpoint found, starting from the beginning.")
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if (state.get("source") != self.source or state["offset"] > os.path.getsize(self.source)
+                or fingerprint(self.source, state["offset"]) != state.get("fingerprint")):
+            print("Checkpoint belongs to another version of the file, starting from the beginning.")
+            return None
+        print(f"Resuming after batch {state['batches']} ({state['rows']:,} rows, byte {state['offset']:,}).")
+        return state
+
+    def save(self, offset, batches, rows, extra=None):
+        state = {
+            "source": self.source,
+            "offset": offset,
+            "fingerprint": fingerprint(self.source, offset),
+            "batches": batches,
+            "rows": rows,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **(extra or {}),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Write aside and rename so a crash mid-save keeps the previous checkpoint
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def checkpointed(batches, checkpoint, progress, state=None, quarantine=None, snapshot=None):
+    """Passes batches through and saves a checkpoint once the sink asks for the next one.
+
+    A sink only asks for the next batch after committing the current one, so
+    the save happens after the commit. progress is the dict filled by
+    iter_csv_range. Quarantined rows are flushed first, since the rows before
+    the checkpoint are never read again. snapshot (if given) returns a dict
+    of extra state saved with every checkpoint.
+    """
+    batches_done = state["batches"] if state else 0
+    rows_done = state["rows"] if state else 0
+    for batch in batches:
+        offset = progress["offset"]  # reader position just after this batch's last row
+        yield batch
+        batches_done += 1
+        rows_done += len(batch)
+        if quarantine is not None:
+            quarantine.flush()
+        checkpoint.save(offset, batches_done, rows_done, snapshot() if snapshot else None)
+    checkpoint.clear()
+    print(f"Load complete ({rows_done:,} rows in {batches_done} batches), checkpoint removed.")
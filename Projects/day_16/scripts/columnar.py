@@ -0,0 +1,115 @@
+"""Columnar (pandas) transform engine.
+
+Same rules as loader.clean_data, but applied to whole columns at once instead
+of one dict per row. pandas is only needed if you use this engine; pyarrow is
+optional and makes both parsing and the string ops much faster:
+    pip install pandas pyarrow
+"""
+import os
+from scripts.validation import INT_PATTERN, validate_frame
+from scripts.encoding import title_column
+from scripts.compressed import detect_compression
+
+def _pandas():
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError("The columnar engine needs pandas: pip install pandas") from e
+    return pd
+
+def _read_options():
+    """Use the pyarrow parser + Arrow-backed strings when pyarrow is installed."""
+    try:
+        import pyarrow  # noqa: F401
+        return {"dtype": "string[pyarrow]", "engine": "pyarrow"}
+    except ImportError:
+        return {"dtype": str}
+
+# --- EXTRACT ---
+def _read_frame(pd, filepath):
+    """pd.read_csv with the fastest parser that accepts the file.
+
+    pyarrow's parser rejects the whole file on a row with a missing or extra
+    field ("Dan,90"), which csv.DictReader reads and validation quarantines.
+    The C parser with usecols reads those too: short rows are padded with
+    NaN (a missing value to validate_frame), extra fields are dropped.
+    """
+    common = {"keep_default_na": False, "encoding": "utf-8", "compression": detect_compression(filepath)}
+    options = _read_options()
+    if options.get("engine") == "pyarrow":
+        try:
+            return pd.read_csv(filepath, **common, **options)
+        except pd.errors.ParserError as e:
+            print(f"pyarrow can't parse {filepath} ({e}); re-reading it with the C parser.")
+    columns = list(pd.read_csv(filepath, nrows=0, **common).columns)
+    return pd.read_csv(filepath, usecols=columns, dtype=options["dtype"], **common)
+
+def read_csv_columnar(filepath, cache=False):
+    """Reads a CSV into a DataFrame of raw strings (no type guessing, like csv.DictReader).
+
+    cache=True reuses a sidecar Parquet copy while the CSV is unchanged
+    (see scripts/csv_cache.py), which skips parsing altogether. Compressed
+    files are detected by content, like loader.read_csv does.
+    """
+    pd = _pandas()
+    if cache:
+        return _read_csv_cached(filepath)
+    print(f"Reading data from {filepath} (columnar)...")
+    try:
+        df = _read_frame(pd, filepath)
+        print(f"Successfully read {len(df)} raw records.")
+        return df
+    except FileNotFoundError:
+        print(f"Error: File not found at {filepath}")
+        return pd.DataFrame(columns=["name", "marks", "city"])
+
+def _read_csv_cached(filepath):
+    from scripts.csv_cache import load_cache, save_cache, cache_available, cache_path, source_key
+    pd = _pandas()
+    table = load_cache(filepath)
+    if table is not None:
+        print(f"Read {table.num_rows} raw records from cache {cache_path(filepath)}.")
+        # Same Arrow-backed strings read_csv_columnar gives when pyarrow is installed
+        import pyarrow as pa
+        strings = pd.StringDtype("pyarrow")
+        return table.to_pandas(types_mapper={pa.string(): strings, pa.large_string(): strings}.get)
+    key = source_key(filepath) if os.path.exists(filepath) else None
+    df = read_csv_columnar(filepath)
+    if not df.empty and key and cache_available():
+        import pyarrow as pa
+        save_cache(filepath, pa.Table.from_pandas(df, preserve_index=False), key)
+    return df
+
+# --- TRANSFORM ---
+def clean_frame(df, rules=None, quarantine=None):
+    """Vectorized clean_data: returns a new DataFrame with the same rules applied.
+
+    With rules (see scripts/validation.py) failing rows are dropped and sent
+    to quarantine instead of having their marks set to 0.
+    """
+    print("Cleaning and transforming data (columnar)...")
+    if rules is not None:
+        df = validate_frame(df, rules, quarantine)
+    out = df.copy()
+
+    # Transformation 1: marks -> int, anything int() would reject becomes 0.
+    # Validate with one regex pass, then cast the whole column in one go
+    # (cheaper than pd.to_numeric(errors="coerce"), which also accepts "7.5").
+    marks = out["marks"].str.strip()
+    valid = marks.str.fullmatch(INT_PATTERN).astype(bool)
+    bad = int((~valid).sum())
+    if bad:
+        print(f"Warning: Could not convert marks for {bad} records. Setting to 0.")
+    out["marks"] = marks.where(valid, "0").astype("int64")
+
+    # Transformation 2 + 3: trim and title case city / name, once per distinct
+    # value; repeating columns come back as categoricals (dictionary encoded)
+    out["city"] = title_column(out["city"])
+    out["name"] = title_column(out["name"])
+
+    print(f"Transformed {len(out)} records.")
+    return out
+
+def clean_data_columnar(df, rules=None, quarantine=None):
+    """clean_frame + conversion to the list-of-dicts shape the loaders expect."""
+    return clean_frame(df, rules, quarantine).to_dict("records")
@@ -0,0 +1,194 @@
+"""Columnar load target: partitioned Parquet or Arrow IPC files.
+
+Cleaned batches are split by the partition columns (city by default) into a
+hive-style layout that Arrow, DuckDB, Spark and pandas can prune:
+
+    <root>/city=Pune/part-<run id>-0.parquet
+    <root>/city=Delhi/part-<run id>-0.parquet
+
+Rows are buffered per partition and written as one row group (Parquet) or
+record batch (Arrow IPC) every row_group_size rows. Both memory and file
+handles stay bounded however many partitions the stream has:
+  - once MAX_BUFFERED_ROWS rows are buffered in total, every buffer is written
+    out (as smaller row groups);
+  - at most MAX_OPEN_WRITERS files are open; the least recently written one is
+    closed to make room, and a partition that comes back later gets a new
+    part file (part-<run id>-1, -2, ...).
+Every run writes new part files next to the old ones; delete the folder to
+start over.
+Low-cardinality text columns (DICTIONARY_COLUMNS) that are not partition
+keys are written as Arrow dictionary arrays: int32 codes plus one shared list
+of values per file, which grows as new values show up.
+
+pyarrow is only needed if you use this sink:
+    pip install pyarrow
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import quote
+from scripts.encoding import CategoryCodes
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+ROW_GROUP_SIZE = 65536
+MAX_BUFFERED_ROWS = 262144
+# Well below the usual 1024 open files limit (ulimit -n)
+MAX_OPEN_WRITERS = 128
+PARTITION_BY = ("city",)
+STUDENT_COLUMNS = (("name", "string"), ("marks", "int64"), ("city", "string"))
+DICTIONARY_COLUMNS = ("city",)
+# Same placeholder Hive/pyarrow use for empty or missing partition values
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("The Parquet/Arrow sink needs pyarrow: pip install pyarrow") from e
+    return pa
+
+def _partition_dir(columns, values):
+    return os.path.join(*(
+        f"{col}={quote(str(value), safe='') if value not in (None, '') else NULL_PARTITION}"
+        for col, value in zip(columns, values)
+    ))
+
+class ColumnarSink:
+    """Writes batches of cleaned rows into partitioned Parquet or Arrow IPC files."""
+
+    def __init__(self, root, format="parquet", partition_by=PARTITION_BY,
+                 row_group_size=ROW_GROUP_SIZE, compression="snappy",
+                 max_buffered_rows=MAX_BUFFERED_ROWS, max_open_writers=MAX_OPEN_WRITERS):
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format {format!r}, expected one of {COLUMNAR_FORMATS}")
+        pa = _pyarrow()
+        self.name = format
+        self.root = root
+        self.format = format
+        self.partition_by = tuple(partition_by)
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.max_buffered_rows = max_buffered_rows
+        self.max_open_writers = max_open_writers
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        # Partition columns live in the folder names, not inside the files
+        columns = [(col, dtype) for col, dtype in STUDENT_COLUMNS if col not in self.partition_by]
+        self.dictionaries = {col: {} for col, _ in columns if col in DICTIONARY_COLUMNS}
+        self.schema = pa.schema([
+            (col, pa.dictionary(pa.int32(), pa.string()) if col in self.dictionaries else getattr(pa, dtype)())
+            for col, dtype in columns
+        ])
+        self.buffers = {}
+        self.buffered = 0
+        self.writers = OrderedDict()  # open writers, least recently written first
+        self.parts = {}  # partition -> part files started so far
+        self.files = 0
+        self.rows = 0  # rows written to files
+
+    def write(self, batch):
+        """Buffers the batch per partition, writing any partition that reached row_group_size."""
+        for row in batch:
+            key = tuple(row.get(col) for col in self.partition_by)
+            buffer = self.buffers.setdefault(key, [])
+            buffer.append(row)
+            self.buffered += 1
+            if len(buffer) >= self.row_group_size:
+                self._flush(key)
+        if self.buffered >= self.max_buffered_rows:
+            for key in list(self.buffers):
+                self._flush(key)
+        return len(batch)
+
+    def _writer(self, key):
+        if key in self.writers:
+            self.writers.move_to_end(key)
+            return self.writers[key]
+        while len(self.writers) >= self.max_open_writers:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+        folder = os.path.join(self.root, _partition_dir(self.partition_by, key)) if key else self.root
+        os.makedirs(folder, exist_ok=True)
+        part = self.parts.get(key, 0)
+        self.parts[key] = part + 1
+        path = os.path.join(folder, f"part-{self.run_id}-{part}.{self.format}")
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        else:
+            pa = _pyarrow()
+            # The dictionaries only ever grow, so later batches add deltas instead of replacing them
+            options = pa.ipc.IpcWriteOptions(compression="zstd" if self.compression else None,
+                                             emit_dictionary_deltas=True)
+            writer = pa.ipc.new_file(path, self.schema, options=options)
+        self.writers[key] = writer
+        self.files += 1
+        return writer
+
+    def _flush(self, key):
+        rows = self.buffers.pop(key, None)
+        if not rows:
+            return
+        self.buffered -= len(rows)
+        pa = _pyarrow()
+        arrays = []
+        for field in self.schema:
+            # Only the schema's columns are picked, so _id or partition keys are left out
+            values = [row.get(field.name) for row in rows]
+            if field.name in self.dictionaries:
+                codes = self.dictionaries[field.name].setdefault(key, CategoryCodes())
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(codes.encode(values), pa.int32()), pa.array(codes.values, pa.string())))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        record_batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        writer = self._writer(key)
+        if self.format == "parquet":
+            writer.write_batch(record_batch, row_group_size=self.row_group_size)
+        else:
+            writer.write_batch(record_batch)
+        self.rows += len(rows)
+
+    def close(self):
+        """Writes the remaining buffered rows and closes every file (a file is only readable after this).
+
+        Every file is closed even if a flush fails; the first error is raised afterwards.
+        """
+        error = None
+        try:
+            for key in list(self.buffers):
+                self._flush(key)
+        except Exception as e:
+            error = e
+        self.buffers.clear()
+        self.buffered = 0
+        while self.writers:
+            _, writer = self.writers.popitem(last=False)
+            try:
+                writer.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+def load_to_columnar(cleaned_data, root, format="parquet", partition_by=PARTITION_BY,
+                     row_group_size=ROW_GROUP_SIZE):
+    """Writes cleaned data as a partitioned Parquet / Arrow IPC dataset under root."""
+    return stream_to_columnar([cleaned_data], root, format, partition_by, row_group_size)
+
+def stream_to_columnar(batches, root, format="parquet", partition_by=PARTITION_BY,
+                       row_group_size=ROW_GROUP_SIZE):
+    """Streams batches of cleaned rows into a partitioned Parquet / Arrow IPC dataset under root."""
+    print(f"Writing {format} dataset to {root} (partitioned by {', '.join(partition_by) or 'nothing'})...")
+    sink = ColumnarSink(root, format, partition_by, row_group_size)
+    try:
+        try:
+            for batch in batches:
+                sink.write(batch)
+        finally:
+            sink.close()
+    except Exception as e:
+        print(f"Error writing {format} dataset: {e}")
+    # Rows that made it into files; buffered rows of a failed run are lost
+    print(f"Wrote {sink.rows} records into {sink.files} {format} files.")
+    return sink.rows
@@ -0,0 +1,129 @@
+"""Transparent decompression for CSV inputs (gzip, bz2, xz, zstd).
+
+The codec is detected from the file's first bytes, not its name, so an export
+called students.csv that is really gzip still reads. The file is decompressed
+as a stream while it is parsed: no uncompressed copy is written to disk and
+memory stays at a few buffers.
+
+gzip, bz2 and xz come with Python; zstd needs the zstandard package:
+    pip install zstandard
+
+read_ahead=True decompresses in a background thread, READ_AHEAD_BLOCKS blocks
+ahead of the CSV parser. All four codecs release the GIL while they work, so
+decompression and parsing overlap on two cores. (libzstd decodes a single
+frame on one thread, so this is the parallelism a .zst stream allows.)
+"""
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import threading
+
+MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+COMPRESSIONS = tuple(name for _, name in MAGIC)
+READ_AHEAD_BYTES = 1 << 20
+READ_AHEAD_BLOCKS = 8
+
+def detect_compression(filepath):
+    """"gzip", "bz2", "xz" or "zstd" from the magic bytes; None for plain (or missing) files."""
+    try:
+        with open(filepath, "rb") as f:
+            head = f.read(6)
+    except FileNotFoundError:
+        return None  # let the caller's own open() report it
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Reading zstd-compressed CSVs needs zstandard: pip install zstandard") from e
+    return zstandard
+
+class ReadAhead(io.RawIOBase):
+    """Reads `stream` in a background thread, keeping up to `blocks` blocks ready for readinto."""
+
+    def __init__(self, stream, blocks=READ_AHEAD_BLOCKS):
+        self.stream = stream
+        self.blocks = queue.Queue(blocks)
+        self.pending = memoryview(b"")
+        self.eof = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fill, name="read-ahead", daemon=True)
+        self.thread.start()
+
+    def _fill(self):
+        try:
+            while not self.stopped.is_set():
+                block = self.stream.read(READ_AHEAD_BYTES)
+                self._put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self._put(e)  # re-raised in the reading thread
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            if self.eof:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.eof = True
+                return 0
+            self.pending = memoryview(block)
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.stream.close()
+        super().close()
+
+def open_binary(filepath, read_ahead=False):
+    """The decompressed bytes of filepath as a binary stream (the file itself if it is plain)."""
+    compression = detect_compression(filepath)
+    if compression is None:
+        return open(filepath, "rb")
+    if compression == "gzip":
+        stream = gzip.open(filepath, "rb")
+    elif compression == "bz2":
+        stream = bz2.open(filepath, "rb")
+    elif compression == "xz":
+        stream = lzma.open(filepath, "rb")
+    else:
+        decompressor = _zstandard().ZstdDecompressor()
+        stream = io.BufferedReader(decompressor.stream_reader(
+            open(filepath, "rb"), read_size=READ_AHEAD_BYTES, read_across_frames=True, closefd=True))
+    if read_ahead:
+        stream = io.BufferedReader(ReadAhead(stream), READ_AHEAD_BYTES)
+    return stream
+
+def open_text(filepath, read_ahead=False):
+    """open(filepath, encoding="utf-8", newline="") that also reads compressed files."""
+    return io.TextIOWrapper(open_binary(filepath, read_ahead), encoding="utf-8", newline="")
@@ -0,0 +1,104 @@
+"""Sidecar Parquet cache for read_csv / read_csv_columnar.
+
+The first parse of data/students.csv is saved next to it as
+data/.students.csv.cache.parquet (raw strings, before cleaning). The source
+path, mtime, size and SHA-256 are stored in the Parquet metadata, and the
+cache is reused while they still describe the CSV:
+  - same size and mtime -> reused without re-reading the CSV
+  - same size, new mtime (touched / copied) -> reused if the SHA-256 matches
+  - anything else -> parsed again and the cache rewritten
+
+pyarrow is only needed if you turn the cache on; without it the CSV is
+simply parsed every time.
+"""
+import os
+import json
+import hashlib
+
+METADATA_KEY = b"day16.csv_cache"
+CACHE_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None, None
+    return pa, pq
+
+def cache_available():
+    if _pyarrow()[0] is None:
+        print("CSV cache disabled: pip install pyarrow to enable it.")
+        return False
+    return True
+
+def cache_path(filepath):
+    folder, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(folder, f".{name}.cache.parquet")
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_key(filepath):
+    stat = os.stat(filepath)
+    return {"version": CACHE_VERSION, "path": os.path.abspath(filepath),
+            "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def load_cache(filepath):
+    """The cached pyarrow Table of raw string columns, or None if there is no valid cache."""
+    pa, pq = _pyarrow()
+    path = cache_path(filepath)
+    if pa is None or not os.path.exists(path) or not os.path.exists(filepath):
+        return None
+    try:
+        stored = json.loads(pq.read_schema(path).metadata[METADATA_KEY])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        return None  # unreadable or foreign file, just parse again
+    current = source_key(filepath)
+    if any(stored.get(k) != current[k] for k in ("version", "path", "size")):
+        return None
+    if stored.get("mtime_ns") != current["mtime_ns"] and stored.get("sha256") != file_hash(filepath):
+        return None
+    return pq.read_table(path)
+
+def save_cache(filepath, table, key):
+    """Writes table as the cache of filepath; key is source_key taken before the parse."""
+    _, pq = _pyarrow()
+    if source_key(filepath) != key:
+        print("Source changed while it was being read; not caching it.")
+        return
+    key = dict(key, sha256=file_hash(filepath))
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), METADATA_KEY: json.dumps(key)})
+    path = cache_path(filepath)
+    # Write aside and rename so a crash never leaves a half-written cache behind
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def rows_to_table(rows):
+    """Raw rows (DictReader dicts or mmap-reader namedtuples) as a Table of string columns."""
+    pa, _ = _pyarrow()
+    if isinstance(rows[0], tuple):
+        fields = rows[0]._fields
+        columns = list(zip(*rows))
+    else:
+        # Not DictReader's None key of a too-long line: its extra fields are dropped, as clean_record does
+        fields = [field for field in rows[0] if field is not None]
+        columns = [[row.get(field) for row in rows] for field in fields]
+    return pa.table({field: pa.array(column, type=pa.string()) for field, column in zip(fields, columns)})
+
+def read_rows_cached(filepath, parse):
+    """read_csv with the cache: list of dicts from the cache, else parse() and cache its rows."""
+    table = load_cache(filepath)
+    if table is not None:
+        print(f"Read {table.num_rows} raw records from cache {cache_path(filepath)}.")
+        return table.to_pylist()
+    key = source_key(filepath) if os.path.exists(filepath) else None
+    rows = parse()
+    if rows and key and cache_available():
+        save_cache(filepath, rows_to_table(rows), key)
+    return rows
@@ -0,0 +1,386 @@
+"""Config-driven DAG pipeline: registered stages joined by bounded queues.
+
+A pipeline file (TOML, or YAML if PyYAML is installed) lists stages; each one
+names a registered `type`, the stages it reads from (`inputs`), how many
+worker threads it gets (`workers`) and the size of its input queue
+(`queue_size`). Every other key is passed to the stage factory, e.g.
+
+    [[stage]]
+    name = "clean"
+    type = "clean"
+    inputs = ["validate"]
+    workers = 2
+
+Batches (lists of row dicts) flow from sources through transforms into
+sinks. A stage with several consumers sends each batch to all of them, and a
+stage with several inputs merges them. Queues are bounded, so a slow stage
+makes its producers wait instead of piling batches up in memory. With
+workers > 1 a stage may pass batches on out of order.
+
+New stage types are added with the @stage decorator:
+  - source:    factory(**params) -> iterable of batches
+  - transform: factory(**params) -> callable(batch) -> batch (may have close())
+  - sink:      factory(**params) -> object with write(batch) -> rows and close()
+"""
+import os
+import queue
+import threading
+import time
+
+STAGE_KINDS = ("source", "transform", "sink")
+QUEUE_SIZE = 4
+# Keys that hold file paths; relative ones are resolved against the config file
+PATH_KEYS = ("path", "db", "root", "rejects")
+
+# type name -> (kind, factory, max_workers)
+REGISTRY = {}
+
+_DONE = object()
+
+def stage(type_name, kind, max_workers=None):
+    """Registers a stage factory under type_name; max_workers caps stages that aren't thread-safe."""
+    if kind not in STAGE_KINDS:
+        raise ValueError(f"Unknown stage kind {kind!r}, expected one of {STAGE_KINDS}")
+
+    def register(factory):
+        REGISTRY[type_name] = (kind, factory, max_workers)
+        return factory
+    return register
+
+# --- CONFIG ---
+def load_config(path):
+    """Reads a pipeline file (.toml, or .yaml/.yml with PyYAML) into a dict."""
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("YAML pipeline files need PyYAML: pip install pyyaml") from e
+        with open(path, encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+    else:
+        import tomllib
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for spec in config.get("stage", []):
+        for key in PATH_KEYS:
+            if isinstance(spec.get(key), str):
+                spec[key] = os.path.join(base, spec[key])
+    return config
+
+class StageSpec:
+    def __init__(self, spec, default_queue_size):
+        spec = dict(spec)
+        try:
+            self.name = spec.pop("name")
+            self.type = spec.pop("type")
+        except KeyError as e:
+            raise ValueError(f"Every stage needs a name and a type, missing {e} in {spec}") from None
+        if self.type not in REGISTRY:
+            raise ValueError(f"Stage {self.name!r}: unknown type {self.type!r}, expected one of {sorted(REGISTRY)}")
+        self.kind, self.factory, max_workers = REGISTRY[self.type]
+        self.inputs = list(spec.pop("inputs", []))
+        self.workers = int(spec.pop("workers", 1))
+        self.queue_size = int(spec.pop("queue_size", default_queue_size))
+        self.params = spec
+        if self.workers < 1:
+            raise ValueError(f"Stage {self.name!r}: workers must be at least 1")
+        if max_workers is not None and self.workers > max_workers:
+            print(f"Stage {self.name!r}: {self.type} supports at most {max_workers} worker(s), using that.")
+            self.workers = max_workers
+        if self.kind == "source" and self.inputs:
+            raise ValueError(f"Source stage {self.name!r} can't have inputs")
+        if self.kind != "source" and not self.inputs:
+            raise ValueError(f"Stage {self.name!r} needs at least one input")
+
+def _check_graph(specs):
+    """Unknown inputs, sinks used as inputs and cycles are config errors."""
+    by_name = {spec.name: spec for spec in specs}
+    if len(by_name) != len(specs):
+        raise ValueError("Stage names must be unique")
+    for spec in specs:
+        for name in spec.inputs:
+            if name not in by_name:
+                raise ValueError(f"Stage {spec.name!r} reads from unknown stage {name!r}")
+            if by_name[name].kind == "sink":
+                raise ValueError(f"Stage {spec.name!r} reads from sink {name!r}")
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a cycle through stage {name!r}")
+        visiting.add(name)
+        for upstream in by_name[name].inputs:
+            visit(upstream)
+        visiting.discard(name)
+        done.add(name)
+    for spec in specs:
+        visit(spec.name)
+
+# --- RUNTIME ---
+class _Node:
+    def __init__(self, spec, report):
+        self.spec = spec
+        self.queue = queue.Queue(maxsize=spec.queue_size) if spec.kind != "source" else None
+        self.consumers = []
+        self.pending_inputs = len(spec.inputs)
+        self.running = spec.workers
+        self.lock = threading.Lock()
+        self.stats = {"batches": 0, "rows_in": 0, "rows_out": 0, "seconds": 0.0, "error": None}
+        self.metrics = report.stage(spec.name) if report is not None else None
+        self.impl = None
+
+    def record(self, rows_in, rows_out, elapsed):
+        with self.lock:
+            self.stats["batches"] += 1
+            self.stats["rows_in"] += rows_in
+            self.stats["rows_out"] += rows_out
+            self.stats["seconds"] += elapsed
+            if self.metrics is not None:
+                self.metrics.seconds += elapsed
+                self.metrics.observe_batch(rows_out, elapsed)
+
+class Pipeline:
+    """A checked DAG of stages; run() executes it once and returns per-stage stats."""
+
+    def __init__(self, config, report=None):
+        default_queue_size = config.get("pipeline", {}).get("queue_size", QUEUE_SIZE)
+        specs = [StageSpec(spec, default_queue_size) for spec in config.get("stage", [])]
+        if not any(spec.kind == "source" for spec in specs):
+            raise ValueError("Pipeline needs at least one source stage")
+        _check_graph(specs)
+        self.nodes = {spec.name: _Node(spec, report) for spec in specs}
+        for node in self.nodes.values():
+            for name in node.spec.inputs:
+                self.nodes[name].consumers.append(node)
+
+    @classmethod
+    def from_file(cls, path, report=None):
+        return cls(load_config(path), report)
+
+    def describe(self):
+        for node in self.nodes.values():
+            spec = node.spec
+            arrow = f" <- {', '.join(spec.inputs)}" if spec.inputs else ""
+            print(f"  {spec.name} ({spec.kind}:{spec.type}, {spec.workers} worker(s)){arrow}")
+
+    def run(self):
+        print("Running pipeline:")
+        self.describe()
+        start = time.perf_counter()
+        try:
+            for node in self.nodes.values():
+                # Build every stage before any thread starts, so a bad config fails cleanly
+                node.impl = node.spec.factory(**node.spec.params)
+        except Exception:
+            for node in self.nodes.values():
+                if hasattr(node.impl, "close"):
+                    node.impl.close()
+            raise
+        threads = [
+            threading.Thread(target=self._work, args=(node,), name=f"{node.spec.name}-{i}", daemon=True)
+            for node in self.nodes.values() for i in range(node.spec.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        for name, node in self.nodes.items():
+            stats = node.stats
+            error = f", error: {stats['error']}" if stats["error"] else ""
+            print(f"  {name}: {stats['batches']} batches, {stats['rows_in']} rows in, "
+                  f"{stats['rows_out']} rows out, {stats['seconds']:.2f}s busy{error}")
+        print(f"Pipeline finished in {elapsed:.2f}s.")
+        return {name: node.stats for name, node in self.nodes.items()}
+
+    def _emit(self, node, batch):
+        for consumer in node.consumers:
+            consumer.queue.put(batch)
+
+    def _work(self, node):
+        try:
+            if node.spec.kind == "source":
+                self._run_source(node)
+            else:
+                self._run_consumer(node)
+        finally:
+            with node.lock:
+                node.running -= 1
+                last = node.running == 0
+            if last:
+                self._finish(node)
+
+    def _run_source(self, node):
+        try:
+            iterator = iter(node.impl)
+            while True:
+                start = time.perf_counter()
+                batch = next(iterator, _DONE)
+                if batch is _DONE:
+                    return
+                node.record(0, len(batch), time.perf_counter() - start)
+                self._emit(node, batch)
+        except Exception as e:
+            print(f"Error in source {node.spec.name}: {e}")
+            node.stats["error"] = str(e)
+
+    def _run_consumer(self, node):
+        failed = False
+        while True:
+            batch = node.queue.get()
+            if batch is _DONE:
+                return
+            if failed:
+                continue  # keep draining so upstream stages never block on a dead stage
+            start = time.perf_counter()
+            try:
+                if node.spec.kind == "sink":
+                    rows_out = node.impl.write(batch)
+                    out = None
+                else:
+                    out = node.impl(batch)
+                    rows_out = len(out) if out else 0
+            except Exception as e:
+                print(f"Error in stage {node.spec.name}: {e}. Skipping the rest for this stage.")
+                node.stats["error"] = str(e)
+                failed = True
+                continue
+            node.record(len(batch), rows_out, time.perf_counter() - start)
+            if out:
+                self._emit(node, out)
+
+    def _finish(self, node):
+        """Runs once per stage after its last worker stops: close it, then end its consumers' input."""
+        close = getattr(node.impl, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing stage {node.spec.name}: {e}")
+                node.stats["error"] = node.stats["error"] or str(e)
+        for consumer in node.consumers:
+            with consumer.lock:
+                consumer.pending_inputs -= 1
+                ended = consumer.pending_inputs == 0
+            if ended:
+                for _ in range(consumer.spec.workers):
+                    consumer.queue.put(_DONE)
+
+def run_config(path, report=None):
+    """Builds the pipeline described in path and runs it."""
+    return Pipeline.from_file(path, report).run()
+
+# --- BUILT-IN STAGES ---
+@stage("csv", "source")
+def csv_source(path, batch_size=1000, read_ahead=False):
+    from scripts.loader import iter_csv, batched
+    return batched(iter_csv(path, read_ahead), batch_size)
+
+@stage("synthetic", "source")
+def synthetic_source(rows=10_000, batch_size=1000, dirty_ratio=0.05, cities=6, seed=42):
+    from scripts.loader import batched
+    from scripts.synth import iter_students
+    fields = ("name", "marks", "city")
+    return batched((dict(zip(fields, row)) for row in iter_students(rows, dirty_ratio, cities, seed)), batch_size)
+
+@stage("validate", "transform")
+class ValidateTransform:
+    """Drops rows that break the rules, quarantining them; one summary line at close()."""
+
+    def __init__(self, rejects=None, rules=None):
+        from collections import Counter
+        from scripts.validation import RULES, QuarantineSink
+        self.rules = rules or RULES
+        self.quarantine = QuarantineSink(rejects) if rejects else None
+        self.counts = Counter()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        from scripts.validation import row_reasons
+        valid, rejects = [], []
+        for record in batch:
+            reasons = row_reasons(record, self.rules)
+            if reasons:
+                rejects.append((record, reasons))
+            else:
+                valid.append(record)
+        if rejects:
+            with self.lock:
+                self.rejected += len(rejects)
+                for _, reasons in rejects:
+                    self.counts.update(reasons)
+                if self.quarantine is not None:
+                    self.quarantine.write(rejects)
+        return valid
+
+    def close(self):
+        from scripts.validation import report_rejects
+        report_rejects(self.counts, self.rejected)
+        if self.quarantine is not None:
+            self.quarantine.close()
+
+@stage("clean", "transform")
+def clean_transform():
+    from scripts.loader import clean_record
+
+    def clean(batch):
+        return [clean_record(record) for record in batch]
+    return clean
+
+@stage("dedup", "transform", max_workers=1)
+class DedupTransform:
+    """Drops rows whose normalized (name, city, marks) an earlier batch already had."""
+
+    def __init__(self, max_exact=None, spill_dir=None):
+        from scripts.dedup import Deduplicator, MAX_EXACT_KEYS
+        self.dedup = Deduplicator(max_exact=max_exact or MAX_EXACT_KEYS, spill_dir=spill_dir)
+
+    def __call__(self, batch):
+        return self.dedup.filter(batch)
+
+    def close(self):
+        self.dedup.close()
+
+@stage("aggregate", "transform", max_workers=1)
+class AggregateTransform:
+    """Passes batches through unchanged, keeping per-group statistics; writes the summary at close()."""
+
+    def __init__(self, db="school.db", group_by="city", measure="marks", merge=True):
+        from scripts.aggregate import Aggregator
+        self.db = db
+        self.merge = merge
+        self.aggregator = Aggregator(group_by, measure)
+
+    def __call__(self, batch):
+        return self.aggregator.update(batch)
+
+    def close(self):
+        from scripts.aggregate import write_summary
+        write_summary(self.aggregator, self.db, merge=self.merge)
+
+@stage("sql", "sink")
+def sql_sink(db="school.db", mode="core", profile="default", key=None):
+    from scripts.fanout import SQLSink
+    from scripts.loader import NATURAL_KEY, parse_key
+    return SQLSink(db, mode=mode, profile=profile, key=parse_key(key) if key else NATURAL_KEY)
+
+@stage("mongo", "sink")
+def mongo_sink(uri=None, db_name="school", collection_name="students_etl", ordered=True, upsert=False, key=None):
+    from scripts.fanout import MongoSink
+    from scripts.loader import MONGO_URI, NATURAL_KEY, parse_key
+    return MongoSink(connection_string=uri or MONGO_URI, db_name=db_name, collection_name=collection_name,
+                     ordered=ordered, upsert=upsert, key=parse_key(key) if key else NATURAL_KEY)
+
+@stage("parquet", "sink", max_workers=1)
+def parquet_sink(root, partition_by=("city",), row_group_size=65536):
+    from scripts.columnar_sink import ColumnarSink
+    return ColumnarSink(root, "parquet", partition_by, row_group_size)
+
+@stage("arrow", "sink", max_workers=1)
+def arrow_sink(root, partition_by=("city",), row_group_size=65536):
+    from scripts.columnar_sink import ColumnarSink
+    return ColumnarSink(root, "arrow", partition_by, row_group_size)
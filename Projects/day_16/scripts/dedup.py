@@ -0,0 +1,208 @@
+"""Duplicate detection for cleaned rows, keyed on normalized (name, city, marks).
+
+Each row's key fields are stripped and casefolded and hashed to a 16-byte
+BLAKE2b digest. Small inputs keep the digests in an exact set. Once more than
+max_exact distinct rows have been seen, the Deduplicator switches to:
+
+  - a scalable Bloom filter (a chain of filters that double in size, each
+    with a tighter error rate), a few bytes per row instead of ~80, and
+  - an on-disk spill store (SQLite file in a temp dir) holding every digest.
+
+A Bloom "no" means the row is new and never touches the disk. A "maybe" is
+checked against the spill store, so a false positive costs one lookup and
+never drops a unique row.
+"""
+import hashlib
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+DEDUP_KEY = ("name", "city", "marks")
+MAX_EXACT_KEYS = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+BLOOM_GROWTH = 2
+BLOOM_TIGHTENING = 0.5
+SPILL_FLUSH_KEYS = 50_000
+
+def _halves(digest):
+    """Two 64-bit hashes for double hashing (the second one odd, so it never repeats early)."""
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:16], "little") | 1
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, h1, h2):
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, hashes):
+        h1, h2 = hashes
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False  # most new keys stop at the first or second probe
+        return True
+
+class ScalableBloomFilter:
+    """Bloom filters chained as they fill up; the total false-positive rate stays near error_rate."""
+
+    def __init__(self, initial_capacity, error_rate=BLOOM_ERROR_RATE):
+        self.error_rate = error_rate
+        # Errors of the chain add up: e * (1 + t + t^2 + ...) = e / (1 - t)
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - BLOOM_TIGHTENING))]
+
+    def add(self, h1, h2):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * BLOOM_GROWTH,
+                                  error_rate=self.error_rate * (1 - BLOOM_TIGHTENING)
+                                  * BLOOM_TIGHTENING ** len(self.filters))
+            self.filters.append(current)
+        current.add(h1, h2)
+
+    def __contains__(self, hashes):
+        return any(hashes in bloom for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+class SpillStore:
+    """Every digest seen, in a throwaway SQLite file; new ones are inserted in bulk."""
+
+    def __init__(self, directory=None):
+        self.directory = tempfile.mkdtemp(prefix="dedup-", dir=directory)
+        self.conn = sqlite3.connect(os.path.join(self.directory, "seen.db"))
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.pending = set()
+
+    def add(self, digest):
+        self.pending.add(digest)
+        if len(self.pending) >= SPILL_FLUSH_KEYS:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((d,) for d in self.pending))
+            self.conn.commit()
+            self.pending = set()
+
+    def __contains__(self, digest):
+        if digest in self.pending:
+            return True
+        return self.conn.execute("SELECT 1 FROM seen WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def close(self):
+        self.conn.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class Deduplicator:
+    """Drops rows whose normalized key was seen before (exact set, then Bloom filter + spill)."""
+
+    def __init__(self, key=DEDUP_KEY, max_exact=MAX_EXACT_KEYS, error_rate=BLOOM_ERROR_RATE, spill_dir=None):
+        self.key = key
+        self.max_exact = max_exact
+        self.error_rate = error_rate
+        self.spill_dir = spill_dir
+        self.seen = set()
+        self.bloom = None
+        self.spill = None
+        self.rows = 0
+        self.duplicates = 0
+        self.disk_checks = 0
+
+    @property
+    def mode(self):
+        return "exact" if self.bloom is None else "bloom+spill"
+
+    def digest(self, row):
+        parts = (str(row.get(field, "")).strip().casefold() for field in self.key)
+        return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+    def is_duplicate(self, row):
+        digest = self.digest(row)
+        if self.bloom is None:
+            if digest in self.seen:
+                return True
+            self.seen.add(digest)
+            if len(self.seen) > self.max_exact:
+                self._spill()
+            return False
+        hashes = _halves(digest)
+        if hashes in self.bloom:
+            self.disk_checks += 1
+            if digest in self.spill:
+                return True
+        self.bloom.add(*hashes)
+        self.spill.add(digest)
+        return False
+
+    def _spill(self):
+        print(f"Dedup: more than {self.max_exact:,} distinct rows, "
+              "switching to a Bloom filter + on-disk key store.")
+        self.bloom = ScalableBloomFilter(self.max_exact * BLOOM_GROWTH, self.error_rate)
+        self.spill = SpillStore(self.spill_dir)
+        for digest in self.seen:
+            self.bloom.add(*_halves(digest))
+            self.spill.add(digest)
+        self.spill.flush()
+        self.seen = set()
+
+    def filter(self, rows):
+        """The rows whose key wasn't seen before, in order."""
+        unique = [row for row in rows if not self.is_duplicate(row)]
+        self.rows += len(rows)
+        self.duplicates += len(rows) - len(unique)
+        return unique
+
+    def remember(self, rows):
+        """Marks rows as seen without counting them (rebuilding the state of an earlier, resumed run)."""
+        for row in rows:
+            self.is_duplicate(row)
+
+    def close(self):
+        """Prints the duplicate count and removes the spill store."""
+        if self.rows:
+            extra = (f", Bloom filter {self.bloom.nbytes / 2**20:,.1f} MiB, {self.disk_checks:,} disk checks"
+                     if self.bloom is not None else "")
+            print(f"Dedup ({self.mode}): dropped {self.duplicates:,} duplicate rows "
+                  f"of {self.rows:,}{extra}.")
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+def deduplicated(batches, dedup, report=None):
+    """Drops duplicate rows from every batch (empty batches are skipped); dedup=None passes them through."""
+    if dedup is None:
+        yield from batches
+        return
+    stats = report.stage("dedup") if report else None
+    try:
+        for batch in batches:
+            start = time.perf_counter()
+            unique = dedup.filter(batch)
+            if stats:
+                stats.seconds += time.perf_counter() - start
+                stats.rows += len(batch)
+            if unique:
+                yield unique
+    finally:
+        dedup.close()
+        if report:
+            report.stage("duplicates").rows = dedup.duplicates
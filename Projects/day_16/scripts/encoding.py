@@ -0,0 +1,70 @@
+"""Dictionary encoding for repeated text columns (city, and names when they repeat).
+
+TextDictionary caches strip().title() per distinct raw value and interns the
+result, so a million rows with six cities run the string ops six times and
+share six str objects. A column with too many distinct values (names are
+usually unique) would only pay for the lookups, so once a dictionary holds
+max_size values it turns itself off and normalizes directly.
+
+CategoryCodes hands out stable int codes in first-seen order; the columnar
+sink writes them as Arrow dictionary arrays.
+"""
+import sys
+
+DICTIONARY_SIZE = 1 << 16
+# The columnar engine only builds categoricals below this distinct/rows ratio
+MAX_DISTINCT_RATIO = 0.5
+
+def title_text(raw):
+    return raw.strip().title()
+
+class TextDictionary:
+    """title_text with one cached, interned result per distinct raw value."""
+
+    def __init__(self, max_size=DICTIONARY_SIZE):
+        self.values = {}
+        self.max_size = max_size
+        self.normalize = self._cached
+
+    def _cached(self, raw):
+        value = self.values.get(raw)
+        if value is None:
+            value = self.values[raw] = sys.intern(title_text(raw))
+            if len(self.values) >= self.max_size:
+                # High cardinality: the cache would cost more than it saves
+                self.values.clear()
+                self.normalize = title_text
+        return value
+
+class CategoryCodes:
+    """Assigns int codes to values in first-seen order; values[code] maps them back."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, values):
+        codes = self.codes
+        out = []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            out.append(code)
+        return out
+
+def title_column(series):
+    """Vectorized strip().title() run once per distinct value; returns a categorical if it repeats."""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(series)
+    if len(uniques) > len(series) * MAX_DISTINCT_RATIO:
+        return series.str.strip().str.title()
+    # Different raw spellings (" pune", "PUNE") can clean to the same value,
+    # so factorize again after cleaning to keep the categories unique
+    cleaned_codes, categories = pd.factorize(pd.Series(uniques).str.strip().str.title())
+    mapped = cleaned_codes[codes]
+    mapped[codes < 0] = -1  # keep missing values missing
+    return pd.Series(pd.Categorical.from_codes(mapped, categories=categories),
+                     index=series.index, name=series.name)
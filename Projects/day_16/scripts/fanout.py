@@ -0,0 +1,135 @@
+"""Concurrent fan-out load stage.
+
+One producer pulls cleaned batches and puts each batch on a bounded queue per
+sink; every sink drains its own queue in a worker thread (the blocking
+SQLAlchemy / pymongo calls release the GIL while waiting on I/O). Total load
+time becomes roughly max(sink) instead of sum(sink), and a slow sink only
+holds queue_size batches before the producer waits for it (backpressure).
+"""
+import asyncio
+import time
+from contextlib import ExitStack
+from scripts.loader import (
+    Base, NATURAL_KEY, MONGO_URI, _write_sql, ensure_natural_key, make_engine, deferred_indexes,
+    _write_mongo_batch, ensure_mongo_key, get_mongo_client,
+)
+
+QUEUE_SIZE = 4
+
+# --- SINKS ---
+class SQLSink:
+    """Writes batches into SQLite through one engine, one transaction per batch."""
+    name = "sql"
+
+    def __init__(self, db_name="school.db", mode="core", key=NATURAL_KEY, profile="default"):
+        self.mode = mode
+        self.key = key
+        self.engine = make_engine(db_name, profile)
+        Base.metadata.create_all(self.engine)
+        if mode == "upsert":
+            ensure_natural_key(self.engine, key)
+        # Plain indexes (bulk profiles) are dropped for the whole run and rebuilt in close()
+        self.deferred = ExitStack()
+        self.deferred.enter_context(deferred_indexes(self.engine, profile))
+
+    def write(self, batch):
+        return _write_sql(self.engine, batch, self.mode, chunk_size=len(batch), key=self.key)
+
+    def close(self):
+        try:
+            self.deferred.close()
+        finally:
+            self.engine.dispose()
+
+class MongoSink:
+    """Writes batches into one Mongo collection with insert_many or keyed upserts."""
+    name = "mongo"
+
+    def __init__(self, client=None, connection_string=MONGO_URI, db_name="school",
+                 collection_name="students_etl", ordered=True, upsert=False, key=NATURAL_KEY):
+        self.own_client = client is None
+        self.client = client or get_mongo_client(connection_string)
+        self.collection = self.client[db_name][collection_name]
+        self.ordered = ordered
+        self.upsert = upsert
+        self.key = key
+        if upsert:
+            ensure_mongo_key(self.collection, key)
+
+    def write(self, batch):
+        # insert_many adds "_id" to each dict; copy so other sinks see the batch untouched
+        docs = [dict(doc) for doc in batch]
+        return _write_mongo_batch(self.collection, docs, self.ordered, self.upsert, self.key)
+
+    def close(self):
+        if self.own_client:
+            self.client.close()
+
+# --- FAN-OUT ---
+_DONE = object()
+
+async def _produce(batches, queues):
+    iterator = iter(batches)
+    while True:
+        # Parsing/cleaning is blocking work too, keep it off the event loop
+        batch = await asyncio.to_thread(next, iterator, _DONE)
+        if batch is _DONE:
+            break
+        for queue in queues:
+            await queue.put(batch)
+    for queue in queues:
+        await queue.put(_DONE)
+
+async def _consume(sink, queue, stats, stage=None):
+    failed = False
+    while True:
+        batch = await queue.get()
+        if batch is _DONE:
+            return
+        if failed:
+            continue  # keep draining so the producer never blocks on a dead sink
+        start = time.perf_counter()
+        try:
+            written = await asyncio.to_thread(sink.write, batch)
+            stats["rows"] += written
+        except Exception as e:
+            print(f"Error loading batch to {sink.name}: {e}. Skipping the rest for this sink.")
+            stats["error"] = str(e)
+            failed = True
+            written = 0
+        elapsed = time.perf_counter() - start
+        stats["seconds"] += elapsed
+        if stage is not None:
+            stage.seconds += elapsed
+            stage.observe_batch(written, elapsed)
+
+async def fan_out(batches, sinks, queue_size=QUEUE_SIZE, report=None):
+    """Sends every batch to every sink concurrently; returns {sink name: stats}.
+
+    With a metrics.RunReport, each sink gets a "load:<name>" stage with its
+    batch latency histogram.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in sinks]
+    stats = {sink.name: {"rows": 0, "seconds": 0.0, "error": None} for sink in sinks}
+    await asyncio.gather(
+        _produce(batches, queues),
+        *(_consume(sink, queue, stats[sink.name], report.stage(f"load:{sink.name}") if report else None)
+          for sink, queue in zip(sinks, queues)),
+    )
+    return stats
+
+def load_fan_out(batches, sinks, queue_size=QUEUE_SIZE, report=None):
+    """Sync entry point: runs fan_out and closes the sinks afterwards."""
+    print(f"Fanning out to {', '.join(sink.name for sink in sinks)} (queue size {queue_size})...")
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(fan_out(batches, sinks, queue_size, report))
+    finally:
+        for sink in sinks:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    for name, sink_stats in stats.items():
+        print(f"  {name}: {sink_stats['rows']} rows, {sink_stats['seconds']:.2f}s busy")
+    print(f"Fan-out finished in {elapsed:.2f}s (sum of sinks would be "
+          f"{sum(s['seconds'] for s in stats.values()):.2f}s).")
+    return stats
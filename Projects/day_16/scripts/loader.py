@@ -1,16 +1,53 @@
 import csv
-from sqlalchemy import create_engine, Column, Integer, String
+import re
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from sqlalchemy import create_engine, event, insert, inspect, text, Column, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from collections import Counter
+from scripts.validation import validate, iter_valid, split_valid, report_rejects, INT_PATTERN
+from scripts.encoding import TextDictionary
+from scripts.compressed import open_text, detect_compression
+from scripts.schema import read_typed, typed_rows
 
 # --- EXTRACT ---
-def read_csv(filepath):
-    """Reads a CSV file into a list of dictionaries."""
+READ_BACKENDS = ("csv", "mmap")
+
+def read_csv(filepath, backend="csv", workers=1, cache=False, read_ahead=False, schema=None):
+    """Reads a CSV file into a list of dictionaries.
+
+    backend="mmap" memory-maps the file and parses newline-aligned byte ranges
+    (in `workers` processes) into namedtuples instead (see scripts/mmap_reader.py).
+    cache=True reuses a sidecar Parquet copy while the CSV is unchanged
+    (see scripts/csv_cache.py). gzip / bz2 / xz / zstd files are decompressed
+    on the fly, in a background thread with read_ahead=True (see scripts/compressed.py).
+    schema ({column: "int" | "float" | "str"}, see scripts/schema.py) converts
+    values while parsing instead of returning every value as a string.
+    """
+    if cache:
+        from scripts.csv_cache import read_rows_cached
+        # The cache keeps the raw strings; the schema is applied to its rows
+        rows = read_rows_cached(filepath, lambda: read_csv(filepath, backend, workers, read_ahead=read_ahead))
+        return list(typed_rows(rows, schema)) if schema else rows
+    if backend == "mmap" and detect_compression(filepath):
+        print(f"{filepath} is compressed and can't be memory-mapped; using the csv backend.")
+        backend = "csv"
+    if backend == "mmap":
+        from scripts.mmap_reader import read_csv_mmap
+        rows = read_csv_mmap(filepath, workers)
+        return list(typed_rows(rows, schema)) if schema else rows
+    if backend != "csv":
+        raise ValueError(f"Unknown read backend {backend!r}, expected one of {READ_BACKENDS}")
     print(f"Reading data from {filepath}...")
     data = []
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        with open_text(filepath, read_ahead) as f:
+            reader = read_typed(f, schema) if schema else csv.DictReader(f)
             for row in reader:
                 data.append(row)
         print(f"Successfully read {len(data)} raw records.")
@@ -19,34 +56,131 @@ def read_csv(filepath):
         print(f"Error: File not found at {filepath}")
         return []
 
+def iter_csv(filepath, read_ahead=False, schema=None):
+    """Yields CSV rows one by one instead of building a list (streaming mode)."""
+    print(f"Streaming data from {filepath}...")
+    try:
+        with open_text(filepath, read_ahead) as f:
+            yield from read_typed(f, schema) if schema else csv.DictReader(f)
+    except FileNotFoundError:
+        print(f"Error: File not found at {filepath}")
+
+def batched(records, batch_size=1000):
+    """Groups any iterable of records into lists of at most batch_size items."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 # --- TRANSFORM ---
-def clean_data(raw_records):
-    """Cleans and transforms raw CSV data."""
-    print("Cleaning and transforming data...")
-    cleaned = []
-    for record in raw_records:
-        # Create a copy to avoid modifying original data incidentally
-        clean_record = record.copy() 
-        
-        # Transformation 1: Convert marks to integer
-        # Using try/except to handle potential bad data
+_INT = re.compile(INT_PATTERN)
+# Per-process caches of cleaned text; the name one switches itself off when names are unique
+_CITIES = TextDictionary()
+_NAMES = TextDictionary()
+
+def clean_record(record):
+    """Cleans a single raw CSV record (dict or mmap-reader namedtuple) and returns a new dict."""
+    # Create a copy to avoid modifying original data incidentally
+    row = record._asdict() if isinstance(record, tuple) else record.copy()
+    # Extra fields of a too-long line (csv.DictReader's None key), dropped like the columnar reader does
+    row.pop(None, None)
+    
+    # Transformation 1: Convert marks to integer
+    # (typed reads, see scripts/schema.py, already did; bad data stays a str or None)
+    # Using try/except to handle potential bad data
+    if isinstance(row["marks"], float) and row["marks"].is_integer():
+        row["marks"] = int(row["marks"])  # a float-typed read (--schema marks=float)
+    elif not isinstance(row["marks"], int):
         try:
-            clean_record["marks"] = int(clean_record["marks"].strip())
-        except ValueError:
-             print(f"Warning: Could not convert marks for {clean_record['name']}. Setting to 0.")
-             clean_record["marks"] = 0
-             
-        # Transformation 2: Title case city and trim whitespace
-        clean_record["city"] = clean_record["city"].strip().title()
-        
-        # Transformation 3: Title case name just in case
-        clean_record["name"] = clean_record["name"].strip().title()
-        
-        cleaned.append(clean_record)
-        
+            marks = row["marks"].strip()
+            # ASCII digits only, like validation and the columnar engine (int() also takes "٣" or "1_000")
+            if not _INT.fullmatch(marks):
+                raise ValueError(marks)
+            row["marks"] = int(marks)
+        except (AttributeError, ValueError):
+             print(f"Warning: Could not convert marks for {row['name']}. Setting to 0.")
+             row["marks"] = 0
+         
+    # Transformation 2: Title case city and trim whitespace
+    # (cached per distinct raw city, so every "Pune" is the same str object)
+    row["city"] = _CITIES.normalize(row["city"])
+    
+    # Transformation 3: Title case name just in case
+    row["name"] = _NAMES.normalize(row["name"])
+    
+    return row
+
+CLEAN_CHUNK_SIZE = 10000
+
+def _clean_chunk(records, fields=None):
+    """Worker-process entry point: cleans one chunk of records.
+
+    Rows from the mmap reader arrive as plain tuples plus their field names,
+    since their namedtuple class is made at runtime and can't be pickled.
+    """
+    if fields is not None:
+        records = [dict(zip(fields, values)) for values in records]
+    return [clean_record(record) for record in records]
+
+def clean_data(raw_records, workers=1, chunk_size=CLEAN_CHUNK_SIZE, rules=None, quarantine=None):
+    """Cleans and transforms raw CSV data.
+
+    With workers > 1 the records are split into chunks of chunk_size and
+    cleaned in a process pool; pool.map keeps the output in input order.
+    With rules (see scripts/validation.py) rows that fail them are dropped
+    and written to quarantine in bulk instead of getting marks = 0.
+    """
+    print("Cleaning and transforming data...")
+    if rules is not None:
+        raw_records = validate(raw_records, rules, quarantine)
+    if workers > 1:
+        cleaned = []
+        chunks = batched(raw_records, chunk_size)
+        fields = getattr(raw_records[0], "_fields", None) if raw_records else None
+        if fields is not None:
+            chunks = ([tuple(row) for row in chunk] for chunk in chunks)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_clean_chunk, chunks, repeat(fields)):
+                cleaned.extend(chunk)
+    else:
+        cleaned = _clean_chunk(raw_records)
     print(f"Transformed {len(cleaned)} records.")
     return cleaned
 
+def iter_clean(raw_records, rules=None, quarantine=None):
+    """Lazily cleans records as they arrive (streaming counterpart of clean_data)."""
+    if rules is not None:
+        raw_records = iter_valid(raw_records, rules, quarantine)
+    for record in raw_records:
+        yield clean_record(record)
+
+def clean_batches(raw_batches, rules=None, quarantine=None):
+    """Cleans batch by batch: each raw batch becomes one batch of its valid rows (empty ones are skipped).
+
+    A cleaned batch ends exactly where its raw batch did, so the reader's
+    position still marks the end of the batch (checkpoints rely on that).
+    Like iter_valid, prints one validation summary at the end.
+    """
+    counts = Counter()
+    rejected = 0
+    try:
+        for batch in raw_batches:
+            if rules is not None:
+                batch, rejects = split_valid(batch, rules)
+                if quarantine is not None:
+                    quarantine.write(rejects)
+                counts.update(reason for _, reasons in rejects for reason in reasons)
+                rejected += len(rejects)
+            cleaned = [clean_record(record) for record in batch]
+            if cleaned:
+                yield cleaned
+    finally:
+        report_rejects(counts, rejected)
+
 # --- LOAD (OPTION A: SQL/SQLite) ---
 # SQLAlchemy Setup
 Base = declarative_base()
@@ -58,49 +192,416 @@ class StudentSQL(Base):
     marks = Column(Integer)
     city = Column(String)
 
-def load_to_sql(cleaned_data, db_name="school.db"):
-    """Loads cleaned data into SQLite using SQLAlchemy."""
-    print(f"Loading data into SQL database: {db_name}...")
-    
-    # Create engine and tables
+SQL_LOAD_MODES = ("orm", "core", "sqlite3", "upsert")
+SQL_CHUNK_SIZE = 10000
+
+# Connection settings per load profile (see make_engine / scripts/bench_sql_load.py)
+BULK_PRAGMAS = {"journal_mode": "WAL", "cache_size": -262144, "temp_store": "MEMORY"}  # 256 MiB cache
+SQLITE_PROFILES = {
+    "default": {"pragmas": {}, "defer_indexes": False},
+    # WAL + synchronous=NORMAL: still consistent after a crash, only the last
+    # commits can be lost on power failure
+    "bulk": {"pragmas": {**BULK_PRAGMAS, "synchronous": "NORMAL"}, "defer_indexes": True},
+    # No fsync at all: fastest, but an OS crash can corrupt the file
+    "bulk-unsafe": {"pragmas": {**BULK_PRAGMAS, "synchronous": "OFF"}, "defer_indexes": True},
+}
+
+def make_engine(db_name, profile="default"):
+    """SQLite engine with the profile's PRAGMAs set on every new connection.
+
+    Bulk profiles also take transaction control away from pysqlite (which
+    opens transactions lazily and implicitly) and emit an explicit BEGIN for
+    every SQLAlchemy transaction instead, so each batch is exactly one
+    transaction.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile {profile!r}, expected one of {tuple(SQLITE_PROFILES)}")
     engine = create_engine(f"sqlite:///{db_name}")
+    pragmas = SQLITE_PROFILES[profile]["pragmas"]
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN")
+    return engine
+
+@contextmanager
+def deferred_indexes(engine, profile="default", table="students"):
+    """Drops the table's plain (non-unique) indexes for the load and rebuilds each one once at the end.
+
+    Unique indexes stay: they are constraints, and upserts need them.
+    """
+    if not SQLITE_PROFILES[profile]["defer_indexes"]:
+        yield []
+        return
+    with engine.begin() as conn:
+        indexes = conn.exec_driver_sql(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'", (table,)
+        ).all()
+        for name, _ in indexes:
+            conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        if indexes:
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                for _, sql in indexes:
+                    conn.exec_driver_sql(sql)
+            print(f"Rebuilt {len(indexes)} deferred index(es) in {time.perf_counter() - start:.2f}s.")
+
+STUDENT_COLUMNS = ("name", "marks", "city")
+# Columns that identify a student across reloads (used by upserts + unique index).
+# data/students.csv has no smaller key (two different "Qarin" rows in Rourkela),
+# so by default it is the whole row: reloads skip the rows already loaded. With a
+# real key (e.g. ("name", "city") where that holds) reloads update changed rows.
+NATURAL_KEY = STUDENT_COLUMNS
+
+def parse_key(spec):
+    """"name,city" (the --key flag) or ["name", "city"] (a pipeline file) as ("name", "city").
+
+    Only STUDENT_COLUMNS are accepted: the key columns end up in SQL statements.
+    """
+    columns = spec.split(",") if isinstance(spec, str) else spec
+    key = tuple(str(column).strip() for column in columns if str(column).strip())
+    if not key or len(set(key)) != len(key) or any(column not in STUDENT_COLUMNS for column in key):
+        raise ValueError(f"Bad key {spec!r}, expected comma-separated columns of {STUDENT_COLUMNS}")
+    return key
+
+def _key_conflict(count, rows, key, where):
+    return ValueError(
+        f"{rows} {where} share {count} ({', '.join(key)}) values, so that is not a unique key. "
+        "Pick columns that identify one student (main.py --key), or rerun with --drop-key-duplicates "
+        "to delete all but the newest of each."
+    )
+
+def ensure_natural_key(engine, key=NATURAL_KEY):
+    """Creates the unique index on the natural key.
+
+    Rows are never deleted to make room for it: if existing rows already
+    share a key this raises (drop_key_duplicates is the opt-in cleanup).
+    """
+    index_name = f"ux_students_{'_'.join(key)}"
+    columns = ", ".join(key)
+    with engine.begin() as conn:
+        if index_name in {ix["name"] for ix in inspect(conn).get_indexes("students")}:
+            return
+        count, rows = conn.execute(text(
+            f"SELECT COUNT(*), COALESCE(SUM(n), 0) FROM "
+            f"(SELECT COUNT(*) AS n FROM students GROUP BY {columns} HAVING n > 1)"
+        )).one()
+        if count:
+            raise _key_conflict(count, rows, key, "rows of students")
+        conn.execute(text(f"CREATE UNIQUE INDEX {index_name} ON students ({columns})"))
+
+def drop_key_duplicates(engine, key=NATURAL_KEY):
+    """Deletes all but the newest row of every key shared by several rows; returns rows deleted."""
+    columns = ", ".join(key)
     Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        removed = conn.execute(text(
+            f"DELETE FROM students WHERE id NOT IN (SELECT MAX(id) FROM students GROUP BY {columns})"
+        )).rowcount
+    print(f"Removed {removed} rows of students sharing a ({columns}) key with a newer row.")
+    return removed
+
+def _student_params(rows):
+    """Plain dicts with only the table columns (no ORM objects)."""
+    return [{column: row[column] for column in STUDENT_COLUMNS} for row in rows]
+
+def _write_sql(engine, rows, mode="orm", chunk_size=SQL_CHUNK_SIZE, key=NATURAL_KEY):
+    """Writes rows inside ONE transaction and returns how many were written.
+
+    - orm:     one StudentSQL object per row + session.add_all (unit of work)
+    - core:    SQLAlchemy Core insert() executemany over chunks of plain dicts
+    - sqlite3: raw DBAPI cursor.executemany over chunks of tuples
+    - upsert:  INSERT ... ON CONFLICT (key) DO UPDATE, so reloads are idempotent
+    """
+    if mode == "orm":
+        Session = sessionmaker(bind=engine)
+        session = Session()
+        try:
+            student_objects = [
+                StudentSQL(name=row["name"], marks=row["marks"], city=row["city"])
+                for row in rows
+            ]
+            # Bulk insert (more efficient than adding one by one)
+            session.add_all(student_objects)
+            session.commit()
+            return len(student_objects)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    if mode == "core":
+        total = 0
+        stmt = insert(StudentSQL.__table__)
+        with engine.begin() as conn:
+            for chunk in batched(rows, chunk_size):
+                conn.execute(stmt, _student_params(chunk))
+                total += len(chunk)
+        return total
+
+    if mode == "sqlite3":
+        total = 0
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            if raw.isolation_level is None:
+                cursor.execute("BEGIN")  # bulk profiles: pysqlite won't open the transaction for us
+            for chunk in batched(rows, chunk_size):
+                cursor.executemany(
+                    "INSERT INTO students (name, marks, city) VALUES (?, ?, ?)",
+                    [(row["name"], row["marks"], row["city"]) for row in chunk],
+                )
+                total += len(chunk)
+            raw.commit()
+            return total
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    if mode == "upsert":
+        total = 0
+        stmt = sqlite_insert(StudentSQL.__table__)
+        updates = {col: stmt.excluded[col] for col in STUDENT_COLUMNS if col not in key}
+        # With the whole row as the key there is nothing to update: a reloaded row is skipped
+        stmt = (stmt.on_conflict_do_update(index_elements=list(key), set_=updates) if updates
+                else stmt.on_conflict_do_nothing(index_elements=list(key)))
+        with engine.begin() as conn:
+            for chunk in batched(rows, chunk_size):
+                conn.execute(stmt, _student_params(chunk))
+                total += len(chunk)
+        return total
+
+    raise ValueError(f"Unknown SQL load mode {mode!r}, expected one of {SQL_LOAD_MODES}")
+
+def load_to_sql(cleaned_data, db_name="school.db", mode="orm", chunk_size=SQL_CHUNK_SIZE, key=NATURAL_KEY,
+                profile="default", writers=1):
+    """Loads cleaned data into SQLite using SQLAlchemy (ORM, Core, raw sqlite3 or upsert).
+
+    profile="bulk" (or "bulk-unsafe") tunes the connection for a big load, see SQLITE_PROFILES.
+    writers > 1 writes chunks through that many connections into staging
+    files and merges them at the end (see scripts/parallel_load.py).
+    """
+    if writers > 1:
+        return _parallel_sql(batched(cleaned_data, chunk_size), db_name, writers, mode, key, profile)
+    print(f"Loading data into SQL database: {db_name} (mode={mode}, profile={profile})...")
     
-    # Create session
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    # Create engine and tables
+    engine = make_engine(db_name, profile)
+    Base.metadata.create_all(engine)
     
     try:
-        # Prepare objects
-        student_objects = []
-        for row in cleaned_data:
-            student_objects.append(
-                StudentSQL(name=row["name"], marks=row["marks"], city=row["city"])
-            )
-        
-        # Bulk insert (more efficient than adding one by one)
-        session.add_all(student_objects)
-        session.commit()
-        print(f"Successfully loaded {len(student_objects)} records into SQL.")
+        if mode == "upsert":
+            ensure_natural_key(engine, key)
+        with deferred_indexes(engine, profile):
+            total = _write_sql(engine, cleaned_data, mode, chunk_size, key)
+        print(f"Successfully loaded {total} records into SQL.")
+        return total
     except Exception as e:
-        session.rollback()
         print(f"Error loading to SQL: {e}")
+        return 0
+    finally:
+        engine.dispose()
+
+def stream_to_sql(batches, db_name="school.db", mode="orm", key=NATURAL_KEY, profile="default", writers=1,
+                  raise_errors=False):
+    """Loads batches of cleaned rows into SQLite, committing after every batch.
+
+    With writers > 1 the batches are staged in parallel and only committed
+    to db_name together at the end. Errors are printed and the rows written
+    so far returned; raise_errors=True re-raises them for callers that must
+    know the load failed (the incremental high-water mark).
+    """
+    if writers > 1:
+        return _parallel_sql(batches, db_name, writers, mode, key, profile, raise_errors)
+    print(f"Streaming data into SQL database: {db_name} (mode={mode}, profile={profile})...")
+    
+    engine = make_engine(db_name, profile)
+    Base.metadata.create_all(engine)
+    
+    total = 0
+    try:
+        if mode == "upsert":
+            ensure_natural_key(engine, key)
+        with deferred_indexes(engine, profile):
+            for batch in batches:
+                total += _write_sql(engine, batch, mode, chunk_size=len(batch), key=key)
+    except Exception as e:
+        print(f"Error loading batch to SQL: {e}")
+        if raise_errors:
+            raise
     finally:
-        session.close()
+        engine.dispose()
+    print(f"Streamed {total} records into SQL.")
+    return total
+
+def _parallel_sql(batches, db_name, writers, mode, key, profile, raise_errors=False):
+    from scripts.parallel_load import parallel_to_sql
+    try:
+        total = parallel_to_sql(batches, db_name, writers, mode, key, profile)
+        print(f"Successfully loaded {total} records into SQL.")
+        return total
+    except Exception as e:
+        print(f"Error loading to SQL: {e}")
+        if raise_errors:
+            raise
+        return 0
 
 # --- LOAD (OPTION B: MongoDB) ---
-def load_to_mongo(cleaned_data, connection_string="mongodb://localhost:27017", db_name="school", collection_name="students_etl"):
-    """Loads cleaned data into MongoDB."""
+MONGO_URI = "mongodb://localhost:27017"
+MONGO_BATCH_SIZE = 1000
+
+def get_mongo_client(connection_string=MONGO_URI, max_pool_size=10):
+    """Creates ONE pooled client that can be shared by every load call in a run."""
+    return MongoClient(connection_string, maxPoolSize=max_pool_size)
+
+def _upsert_batch(collection, batch, ordered, key):
+    """bulk_write of UpdateOne(upsert=True) keyed on the natural key; returns docs written."""
+    requests = [
+        UpdateOne({col: doc[col] for col in key},
+                  {"$set": {k: v for k, v in doc.items() if k != "_id"}},
+                  upsert=True)
+        for doc in batch
+    ]
+    result = collection.bulk_write(requests, ordered=ordered)
+    return result.upserted_count + result.matched_count
+
+def ensure_mongo_key(collection, key=NATURAL_KEY):
+    """Unique index = idempotent upserts + O(log n) lookups by key.
+
+    Like ensure_natural_key, raises instead of deleting documents that already
+    share a key (drop_mongo_key_duplicates is the opt-in cleanup).
+    """
+    try:
+        collection.create_index([(col, 1) for col in key], unique=True)
+    except DuplicateKeyError as e:
+        shared = list(collection.aggregate(_mongo_duplicates(key), allowDiskUse=True))
+        raise _key_conflict(len(shared), sum(group["n"] for group in shared), key,
+                            f"documents of {collection.name}") from e
+
+def _mongo_duplicates(key):
+    return [
+        {"$group": {"_id": {col: f"${col}" for col in key}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+
+def drop_mongo_key_duplicates(collection, key=NATURAL_KEY):
+    """Deletes all but the newest document of every key shared by several; returns documents deleted."""
+    removed = 0
+    for group in collection.aggregate(_mongo_duplicates(key), allowDiskUse=True):
+        # ObjectIds grow with insert time, so the last one is the newest
+        extra = sorted(group["ids"])[:-1]
+        removed += collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    print(f"Removed {removed} documents of {collection.name} sharing a {key} key with a newer one.")
+    return removed
+
+def _write_mongo_batch(collection, batch, ordered=True, upsert=False, key=NATURAL_KEY):
+    """Writes one batch with insert_many (or keyed upserts) and returns docs written.
+
+    ordered=False lets the server apply a batch's documents in parallel and keep
+    going past a failing document instead of stopping at the first error.
+    """
+    try:
+        if upsert:
+            return _upsert_batch(collection, batch, ordered, key)
+        return len(collection.insert_many(batch, ordered=ordered).inserted_ids)
+    except BulkWriteError as e:
+        print(f"Warning: batch had {len(e.details.get('writeErrors', []))} write errors.")
+        if ordered:
+            raise
+        return e.details.get("nInserted", 0) + e.details.get("nUpserted", 0) + e.details.get("nMatched", 0)
+
+def _write_mongo(collection, batches, ordered=True, upsert=False, key=NATURAL_KEY, writers=1, progress=None):
+    """Writes every batch; prints per-batch throughput and returns docs written.
+
+    writers > 1 keeps that many batches in flight on the client's connection
+    pool (see scripts/parallel_load.py). progress["rows"] (if given) holds the
+    running total after every batch, so it survives a later batch's error,
+    like the total of stream_to_sql.
+    """
+    progress = {} if progress is None else progress
+    progress["rows"] = 0
+    if writers > 1:
+        from scripts.parallel_load import parallel_to_mongo
+        return parallel_to_mongo(batches, collection, writers, ordered, upsert, key, progress)
+    if upsert:
+        ensure_mongo_key(collection, key)
+    rates = []
+    for number, batch in enumerate(batches, start=1):
+        start = time.perf_counter()
+        inserted = _write_mongo_batch(collection, batch, ordered, upsert, key)
+        elapsed = time.perf_counter() - start
+        progress["rows"] += inserted
+        rates.append(inserted / elapsed if elapsed else 0.0)
+        print(f"  batch {number}: {inserted} docs in {elapsed * 1000:.1f} ms ({rates[-1]:,.0f} docs/s)")
+    if rates:
+        print(f"Mongo batches: {len(rates)}, docs/s min {min(rates):,.0f} / "
+              f"avg {sum(rates) / len(rates):,.0f} / max {max(rates):,.0f}")
+    return progress["rows"]
+
+def load_to_mongo(cleaned_data, connection_string=MONGO_URI, db_name="school", collection_name="students_etl",
+                  batch_size=MONGO_BATCH_SIZE, ordered=True, client=None, upsert=False, key=NATURAL_KEY,
+                  writers=1):
+    """Loads cleaned data into MongoDB in batches of batch_size documents.
+
+    Pass a client from get_mongo_client() to reuse its connection pool; otherwise
+    a client is created and closed for this call only. upsert=True replaces
+    documents with the same natural key instead of inserting duplicates.
+    """
     print(f"Loading data into Mongo database: {db_name}.{collection_name}...")
     
+    own_client = client is None
+    progress = {"rows": 0}  # docs committed so far, also when a later batch fails
     try:
-        client = MongoClient(connection_string)
-        db = client[db_name]
-        collection = db[collection_name]
+        if own_client:
+            client = MongoClient(connection_string)
+        collection = client[db_name][collection_name]
         
-        # Mongo can insert list of dicts directly
-        result = collection.insert_many(cleaned_data)
-        print(f"Successfully loaded {len(result.inserted_ids)} records into MongoDB.")
-        client.close()
+        # Mongo can insert list of dicts directly, one chunk at a time
+        _write_mongo(collection, batched(cleaned_data, batch_size), ordered, upsert, key, writers, progress)
+        print(f"Successfully loaded {progress['rows']} records into MongoDB.")
     except Exception as e:
-        print(f"Error loading to MongoDB: {e}")
\ No newline at end of file
+        print(f"Error loading to MongoDB: {e}")
+    finally:
+        if own_client and client is not None:
+            client.close()
+    return progress["rows"]
+
+def stream_to_mongo(batches, connection_string=MONGO_URI, db_name="school", collection_name="students_etl",
+                    ordered=True, client=None, upsert=False, key=NATURAL_KEY, writers=1, raise_errors=False):
+    """Loads batches of cleaned rows into MongoDB, one insert_many per batch (writers at a time).
+
+    Like stream_to_sql, returns the docs written so far on an error, or re-raises it with raise_errors=True.
+    """
+    print(f"Streaming data into Mongo database: {db_name}.{collection_name}...")
+    
+    own_client = client is None
+    progress = {"rows": 0}
+    try:
+        if own_client:
+            client = MongoClient(connection_string)
+        collection = client[db_name][collection_name]
+        _write_mongo(collection, batches, ordered, upsert, key, writers, progress)
+    except Exception as e:
+        print(f"Error loading to MongoDB: {e}")
+        if raise_errors:
+            raise
+    finally:
+        if own_client and client is not None:
+            client.close()
+    print(f"Streamed {progress['rows']} records into MongoDB.")
+    return progress["rows"]
@@ -0,0 +1,183 @@
+"""Run instrumentation for the pipeline: stage timings, throughput, memory.
+
+A RunReport collects, per stage (extract / transform / load):
+  - wall time and rows -> rows/sec
+  - bytes read (extract)
+  - per-batch latency histogram (load)
+plus the peak RSS of the process, and writes it all as a JSON run report and,
+optionally, as a Prometheus text-format file.
+"""
+import os
+import sys
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Upper bounds (ms) of the batch latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_END = object()
+
+def peak_rss_bytes():
+    """Peak resident memory of this process, or None where resource is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.batches = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # last one is +Inf
+        self.latency_sum_ms = 0.0
+
+    def observe_batch(self, rows, seconds):
+        """Records one batch of rows that took seconds to process."""
+        ms = seconds * 1000
+        self.batches += 1
+        self.rows += rows
+        self.latency_sum_ms += ms
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def to_dict(self):
+        histogram = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram["le_inf"] = self.buckets[-1]
+        return {
+            "seconds": round(self.seconds, 6),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds else None,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "batch_latency_ms": histogram if self.batches else None,
+        }
+
+class RunReport:
+    """Collects the measurements of one pipeline run."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.seconds = 0.0
+        self.stages = {}
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageStats(name)
+        return self.stages[name]
+
+    @contextmanager
+    def timed(self, name, rows=None):
+        """Times a whole (non-streaming) stage: `with report.timed("extract"): ...`."""
+        stats = self.stage(name)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            if rows is not None:
+                stats.rows += rows
+
+    def meter(self, name, iterable, inner=None):
+        """Wraps a generator stage and times how long each next() takes.
+
+        Generators are chained, so the time of `name` includes the time of the
+        stage it pulls from; pass that stage as inner to subtract it.
+        """
+        # Register the stages now (not on first next()) so reports list them in pipeline order
+        stats = self.stage(name)
+        inner_stats = self.stage(inner) if inner else None
+        return self._meter(stats, inner_stats, iter(iterable))
+
+    def _meter(self, stats, inner_stats, iterator):
+        while True:
+            inner_before = inner_stats.seconds if inner_stats else 0.0
+            start = time.perf_counter()
+            item = next(iterator, _END)
+            spent = time.perf_counter() - start
+            if inner_stats:
+                spent -= inner_stats.seconds - inner_before
+            stats.seconds += spent
+            if item is _END:
+                return
+            stats.rows += len(item) if isinstance(item, list) else 1
+            yield item
+
+    def meter_load(self, batches, name="load"):
+        """Wraps the batch stream handed to a sink; the time the sink holds each batch is its latency."""
+        return self._meter_load(self.stage(name), batches)
+
+    def _meter_load(self, stats, batches):
+        for batch in batches:
+            start = time.perf_counter()
+            yield batch
+            elapsed = time.perf_counter() - start
+            stats.seconds += elapsed
+            stats.observe_batch(len(batch), elapsed)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "mode": self.mode,
+            "started_at": self.started.isoformat(),
+            "seconds": round(self.seconds, 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+        }
+
+    def print_summary(self):
+        print("\n--- Run Report ---")
+        for name, stats in self.stages.items():
+            rate = f"{stats.rows / stats.seconds:,.0f} rows/s" if stats.seconds else "-"
+            print(f"{name:>10}: {stats.seconds:8.3f}s  {stats.rows:>10,} rows  {rate}")
+        rss = peak_rss_bytes()
+        print(f"{'total':>10}: {self.seconds:8.3f}s  peak RSS "
+              f"{f'{rss / 2**20:,.1f} MiB' if rss else 'n/a'}")
+        print("------------------\n")
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Run report written to {path}")
+
+    def write_prometheus(self, path):
+        """Prometheus text exposition format (e.g. for the node_exporter textfile collector)."""
+        lines = [
+            "# TYPE etl_run_seconds gauge",
+            f'etl_run_seconds{{mode="{self.mode}"}} {self.seconds:.6f}',
+        ]
+        # Every family is one TYPE line followed by all of its samples (the format forbids interleaving)
+        for family, value in (("seconds", lambda stats: f"{stats.seconds:.6f}"),
+                              ("rows", lambda stats: stats.rows),
+                              ("bytes", lambda stats: stats.bytes)):
+            lines.append(f"# TYPE etl_stage_{family} gauge")
+            lines += [f'etl_stage_{family}{{stage="{name}"}} {value(stats)}' for name, stats in self.stages.items()]
+        lines.append("# TYPE etl_batch_latency_ms histogram")
+        for name, stats in self.stages.items():
+            if not stats.batches:
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS_MS, stats.buckets):
+                cumulative += count
+                lines.append(f'etl_batch_latency_ms_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'etl_batch_latency_ms_bucket{{stage="{name}",le="+Inf"}} {stats.batches}')
+            lines.append(f'etl_batch_latency_ms_sum{{stage="{name}"}} {stats.latency_sum_ms:.3f}')
+            lines.append(f'etl_batch_latency_ms_count{{stage="{name}"}} {stats.batches}')
+        rss = peak_rss_bytes()
+        if rss is not None:
+            lines += ["# TYPE etl_peak_rss_bytes gauge", f"etl_peak_rss_bytes {rss}"]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"Prometheus metrics written to {path}")
@@ -0,0 +1,79 @@
+"""Memory-mapped, parallel CSV reader (the "mmap" backend of loader.read_csv).
+
+The file is memory-mapped and split into byte ranges that end on a newline;
+each range is parsed with csv.reader on its own, in a process pool when
+workers > 1. Rows come back as namedtuples that share one field list, so
+there is no per-row dict with its own copy of the keys. clean_record accepts
+them like DictReader rows.
+
+Splitting on raw newlines assumes no quoted field contains a line break
+(true for students.csv); use the default csv backend for files that do.
+"""
+import io
+import csv
+import mmap
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+RANGES_PER_WORKER = 4
+MIN_RANGE_BYTES = 1 << 20
+
+def split_ranges(mm, start, parts):
+    """Cuts mm[start:] into at most `parts` (begin, end) ranges that end just after a newline."""
+    size = len(mm)
+    step = max((size - start) // parts, MIN_RANGE_BYTES)
+    ranges = []
+    begin = start
+    while begin < size:
+        newline = mm.find(b"\n", min(begin + step, size) - 1)
+        end = size if newline == -1 else newline + 1
+        ranges.append((begin, end))
+        begin = end
+    return ranges
+
+def _parse_rows(text, width, make=tuple):
+    """Rows of text as make(fields) of exactly width fields (short rows padded with None, like DictReader)."""
+    rows = []
+    for fields in csv.reader(io.StringIO(text, newline="")):
+        if not fields:
+            continue  # DictReader skips blank lines too
+        if len(fields) != width:
+            fields = (fields + [None] * width)[:width]
+        rows.append(make(fields))
+    return rows
+
+def _parse_range(filepath, begin, end, width):
+    """Worker-process entry point: maps the file again and parses one byte range."""
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _parse_rows(mm[begin:end].decode("utf-8"), width)
+
+def read_csv_mmap(filepath, workers=1):
+    """Reads a CSV into a list of namedtuples (fields named after the header)."""
+    print(f"Reading data from {filepath} (mmap, {workers} worker{'s' if workers != 1 else ''})...")
+    try:
+        if os.path.getsize(filepath) == 0:
+            print("Successfully read 0 raw records.")
+            return []
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b"\n") + 1 or len(mm)
+            header = next(csv.reader([mm[:header_end].decode("utf-8")]))
+            Row = namedtuple("Row", header, rename=True)
+            width = len(header)
+
+            if workers > 1:
+                ranges = split_ranges(mm, header_end, workers * RANGES_PER_WORKER)
+                data = []
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # Workers return plain tuples: a namedtuple class made at runtime can't be pickled
+                    begins, ends = [b for b, _ in ranges], [e for _, e in ranges]
+                    for chunk in pool.map(_parse_range, repeat(filepath), begins, ends, repeat(width)):
+                        data.extend(map(Row._make, chunk))
+            else:
+                data = _parse_rows(mm[header_end:].decode("utf-8"), width, Row._make)
+        print(f"Successfully read {len(data)} raw records.")
+        return data
+    except FileNotFoundError:
+        print(f"Error: File not found at {filepath}")
+        return []
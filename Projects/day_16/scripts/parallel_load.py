@@ -0,0 +1,213 @@
+"""Sink-side writer pools: N batches in flight at once instead of one round trip at a time.
+
+write_parallel feeds batches from one producer to `writers` threads through a
+bounded queue (backpressure, like the fan-out stage). Each thread owns one
+write function, so each thread has its own connection:
+
+  - Mongo: every thread calls insert_many / bulk_write on the same collection
+    of one pooled MongoClient; pymongo checks a socket out of the pool per
+    call, so keep writers <= the client's maxPoolSize.
+  - SQLite: one file takes one writer at a time, so every thread writes into
+    a staging table in its own database file (<db>.stage<i>, synchronous=OFF,
+    it is thrown away afterwards). Once every batch is in, the staging
+    tables are ATTACHed and merged into students with INSERT ... SELECT (or
+    an upsert) in ONE transaction, so the target sees all rows or none.
+
+Batches finish out of order. Staged SQL rows carry their position in the
+input as id and are merged in that order, so the result (also which row of
+a key an upsert keeps) is the same as with one writer. Concurrent Mongo
+bulk_writes can't be ordered, so Mongo upserts use one writer.
+"""
+import os
+import queue
+import threading
+import time
+from scripts.loader import (
+    Base, StudentSQL, NATURAL_KEY, STUDENT_COLUMNS, _write_mongo_batch,
+    ensure_natural_key, ensure_mongo_key, make_engine, deferred_indexes,
+)
+
+BATCHES_PER_WRITER = 2
+# SQLite's default limit of attached databases (SQLITE_MAX_ATTACHED)
+MAX_SQL_WRITERS = 10
+_DONE = object()
+
+def write_parallel(batches, write_functions, progress=None):
+    """Writes every batch with one of write_functions, each in its own thread; returns rows written.
+
+    batches can be any items the write functions take (e.g. (first_id, batch) pairs).
+
+    The first error stops the producer, the other threads finish their
+    current batch, and the error is raised here. progress["rows"] (if given)
+    is set to the rows written either way.
+    """
+    work = queue.Queue(len(write_functions) * BATCHES_PER_WRITER)
+    totals = [0] * len(write_functions)
+    errors = []
+
+    def run(number, write):
+        while True:
+            batch = work.get()
+            if batch is _DONE:
+                return
+            if errors:
+                continue  # keep draining so the producer never blocks on a full queue
+            try:
+                totals[number] += write(batch)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(number, write), name=f"writer-{number}")
+               for number, write in enumerate(write_functions)]
+    for thread in threads:
+        thread.start()
+    try:
+        for batch in batches:
+            if errors:
+                break
+            work.put(batch)
+    finally:
+        for _ in threads:
+            work.put(_DONE)
+        for thread in threads:
+            thread.join()
+        if progress is not None:
+            progress["rows"] = sum(totals)
+    if errors:
+        raise errors[0]
+    return sum(totals)
+
+# --- MONGO ---
+def parallel_to_mongo(batches, collection, writers=4, ordered=True, upsert=False, key=NATURAL_KEY, progress=None):
+    """Concurrent insert_many of every batch into collection (upserts use one writer, in batch order)."""
+    if upsert:
+        ensure_mongo_key(collection, key)
+        if writers > 1:
+            # A key in two batches must end with the later one, which concurrent bulk_writes can't promise
+            print(f"Mongo upserts keep batch order, so they use one writer instead of {writers}.")
+            writers = 1
+
+    def write(batch):
+        return _write_mongo_batch(collection, batch, ordered, upsert, key)
+
+    start = time.perf_counter()
+    total = write_parallel(batches, [write] * writers, progress)
+    elapsed = time.perf_counter() - start
+    print(f"Mongo: {total} docs with {writers} writers in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:,.0f} docs/s)")
+    return total
+
+# --- SQL ---
+def stage_paths(db_name, writers):
+    return [f"{db_name}.stage{number}" for number in range(writers)]
+
+def _remove_stage(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def _numbered(batches):
+    """(first_id, batch) pairs: ids count the rows across all batches, in input order."""
+    first_id = 1
+    for batch in batches:
+        yield first_id, batch
+        first_id += len(batch)
+
+def _stage_batch(engine, first_id, batch):
+    """Appends one batch to a staging table, with its rows' input positions as ids."""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if raw.isolation_level is None:
+            cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT INTO students (id, name, marks, city) VALUES (?, ?, ?, ?)",
+            [(number, row["name"], row["marks"], row["city"]) for number, row in enumerate(batch, first_id)],
+        )
+        raw.commit()
+        return len(batch)
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+def _merge_sql(stage_files, mode, key=NATURAL_KEY):
+    """ONE INSERT ... SELECT over all staging tables, in input order (ORDER BY the staged ids)."""
+    columns = ", ".join(STUDENT_COLUMNS)
+    staged = " UNION ALL ".join(f"SELECT id, {columns} FROM stage{number}.students"
+                                for number in range(len(stage_files)))
+    # "WHERE true" tells SQLite's parser an ON CONFLICT belongs to the INSERT, not the SELECT
+    statement = f"INSERT INTO students ({columns}) SELECT {columns} FROM ({staged}) WHERE true ORDER BY id"
+    if mode != "upsert":
+        return statement
+    updates = ", ".join(f"{col} = excluded.{col}" for col in STUDENT_COLUMNS if col not in key)
+    action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return f"{statement} ON CONFLICT ({', '.join(key)}) {action}"
+
+def merge_stages(engine, stage_files, mode="core", key=NATURAL_KEY):
+    """Copies every staging table into students in one transaction; returns rows inserted or updated."""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # ATTACH is not allowed inside a transaction, so attach everything first
+        for number, path in enumerate(stage_files):
+            cursor.execute(f"ATTACH DATABASE ? AS stage{number}", (path,))
+        try:
+            if raw.isolation_level is None:
+                cursor.execute("BEGIN")
+            total = cursor.execute(_merge_sql(stage_files, mode, key)).rowcount
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            for number in range(len(stage_files)):
+                cursor.execute(f"DETACH DATABASE stage{number}")
+        return total
+    finally:
+        raw.close()
+
+def parallel_to_sql(batches, db_name="school.db", writers=4, mode="core", key=NATURAL_KEY, profile="default"):
+    """Writes batches through `writers` connections into staging files, then merges them into db_name.
+
+    Returns the rows written, counted like _write_sql does.
+    """
+    if not 1 <= writers <= MAX_SQL_WRITERS:
+        raise ValueError(f"writers must be between 1 and {MAX_SQL_WRITERS} for SQLite")
+    print(f"Loading data into SQL database: {db_name} (mode={mode}, profile={profile}, {writers} writers)...")
+
+    files = stage_paths(db_name, writers)
+    stages = []
+    engine = make_engine(db_name, profile)
+    try:
+        Base.metadata.create_all(engine)
+        if mode == "upsert":
+            ensure_natural_key(engine, key)
+        for path in files:
+            _remove_stage(path)  # left over from a crashed run
+            stage = make_engine(path, "bulk-unsafe")
+            Base.metadata.create_all(stage, tables=[StudentSQL.__table__])
+            stages.append(stage)
+        # Staging only appends; the upsert happens in the merge
+        start = time.perf_counter()
+        written = write_parallel(_numbered(batches), [
+            lambda item, stage=stage: _stage_batch(stage, *item) for stage in stages
+        ])
+        staged = time.perf_counter() - start
+        for stage in stages:
+            stage.dispose()
+
+        start = time.perf_counter()
+        with deferred_indexes(engine, profile):
+            merged = merge_stages(engine, files, mode, key)
+        print(f"Staged {written} rows in {staged:.2f}s, merged them in {time.perf_counter() - start:.2f}s "
+              f"({merged} inserted or updated).")
+        # Like _write_sql: every row was applied, also an upsert that found nothing to change
+        return written
+    finally:
+        for stage in stages:
+            stage.dispose()
+        for path in files:
+            _remove_stage(path)
+        engine.dispose()
@@ -0,0 +1,246 @@
+"""Profiling for whole pipeline runs (main.py --profile).
+
+StackSampler is a low-overhead sampling profiler. On Unix a SIGPROF timer
+fires every `interval` seconds of CPU time; the handler runs in the main thread
+at the bytecode it interrupted and records the Python stack of every thread
+(sys._current_frames). Elsewhere a background thread samples instead, which is
+biased: with the GIL it mostly gets to run while the pipeline waits on I/O, so
+pure-Python hot spots like clean_record are under-counted.
+
+Each sample is charged to a pipeline stage by the innermost frame of this
+package that belongs to a known stage function (STAGE_MARKERS). That also works
+for the generator chains of the streaming modes: while the sink pulls a batch,
+the innermost frame is clean_record (transform) or the CSV reader (extract),
+not the sink. Unmatched samples go to "other"; time spent blocked (waiting on
+Mongo, a full fan-out queue) uses no CPU and doesn't show up at all.
+
+Output, one folder per run under profiles/:
+    <stage>.collapsed   collapsed stacks ("a;b;c 42"), one file per stage,
+    all.collapsed       for flamegraph.pl, speedscope or inferno
+    run.pstats          python -m pstats profiles/run_.../run.pstats
+
+With --profile cprofile the run is profiled by cProfile alone (the sampler's
+signal handler would show up in it), so run.pstats is deterministic and
+there are no .collapsed files. In the default sample mode run.pstats is
+built from the samples: times are samples x interval and "calls" count
+samples, not calls.
+
+Worker processes (--workers > 1) are not sampled; profile with --workers 1.
+"""
+import os
+import sys
+import marshal
+import signal
+import time
+import threading
+from collections import Counter, defaultdict
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILERS = ("sample", "cprofile")
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 10
+
+# "<module>.py" marks every function of the module, "<module>.py:<function>" just one
+STAGE_MARKERS = {
+    "extract": (
+        "loader.py:read_csv", "loader.py:iter_csv", "incremental.py:iter_csv_range", "mmap_reader.py",
+        "compressed.py", "schema.py", "csv_cache.py", "columnar.py:read_csv_columnar", "shards.py:_process_shard",
+    ),
+    "validate": ("validation.py",),
+    "transform": (
+        "loader.py:clean_record", "loader.py:_clean_chunk", "loader.py:clean_data", "loader.py:iter_clean",
+        "loader.py:clean_batches",
+        "encoding.py", "columnar.py:clean_frame", "columnar.py:clean_data_columnar",
+    ),
+    # Not the deduplicated() wrapper: without --dedup it only passes batches through
+    "dedup": (
+        "dedup.py:filter", "dedup.py:is_duplicate", "dedup.py:digest", "dedup.py:_spill", "dedup.py:_halves",
+        "dedup.py:add", "dedup.py:__contains__", "dedup.py:flush",
+    ),
+    "aggregate": ("aggregate.py",),
+    "load": (
+        "loader.py:_write_sql", "loader.py:_write_mongo", "loader.py:_write_mongo_batch", "loader.py:_upsert_batch",
+        "loader.py:deferred_indexes", "loader.py:ensure_natural_key", "loader.py:ensure_mongo_key",
+        "parallel_load.py", "fanout.py", "columnar_sink.py",
+    ),
+}
+
+def _marker_index():
+    index = {}
+    for stage, markers in STAGE_MARKERS.items():
+        for marker in markers:
+            index[tuple(marker.split(":", 1)) if ":" in marker else (marker,)] = stage
+    return index
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _pstats_key(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+class StackSampler:
+    """Samples the stacks of all threads every interval seconds, per pipeline stage."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = defaultdict(Counter)  # stage -> Counter of stacks (tuples of code objects, root first)
+        self.markers = _marker_index()
+        self.stage_of_code = {}
+        self.count = 0
+        # Signal handlers can only be installed from the main thread
+        self.use_timer = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+        self.previous_handler = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.use_timer:
+            self.previous_handler = signal.signal(signal.SIGPROF, self._on_timer)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        if self.use_timer:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self.previous_handler)
+        else:
+            self.stopped.set()
+            self.thread.join()
+
+    def _on_timer(self, signum, frame):
+        frames = sys._current_frames()
+        frames[threading.get_ident()] = frame  # the interrupted frame, not this handler
+        self._sample(frames)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            del frames[me]
+            self._sample(frames)
+
+    def _code_stage(self, code):
+        stage = self.stage_of_code.get(code, False)
+        if stage is False:
+            stage = None
+            # sqlalchemy has a schema.py too: only this package's modules are stages
+            if os.path.dirname(os.path.abspath(code.co_filename)) == SCRIPTS_DIR:
+                module = os.path.basename(code.co_filename)
+                stage = self.markers.get((module, code.co_name)) or self.markers.get((module,))
+            self.stage_of_code[code] = stage
+        return stage
+
+    def _sample(self, frames):
+        for frame in frames.values():
+            stack = []
+            stage = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code)
+                if stage is None:
+                    stage = self._code_stage(code)
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[stage or "other"][tuple(stack)] += 1
+        self.count += 1
+
+    def write(self, directory):
+        """Writes <stage>.collapsed per stage plus all.collapsed; returns their paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        combined = Counter()
+        for stage, stacks in sorted(self.samples.items()):
+            lines = Counter()
+            for stack, count in stacks.items():
+                lines[";".join(frame_label(code) for code in stack)] += count
+            combined.update(lines)
+            paths.append(self._write_collapsed(os.path.join(directory, f"{stage}.collapsed"), lines))
+        paths.append(self._write_collapsed(os.path.join(directory, "all.collapsed"), combined))
+        return paths
+
+    def write_pstats(self, path):
+        """Writes the samples in the pstats file format (what cProfile's dump_stats writes)."""
+        stats = {}  # function -> [calls, calls, self time, cumulative time, {caller: [...]}]
+        for stacks in self.samples.values():
+            for stack, count in stacks.items():
+                seconds = count * self.interval
+                keys = [_pstats_key(code) for code in stack]
+                for depth, key in enumerate(keys):
+                    entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                    leaf = depth == len(keys) - 1
+                    own = seconds if leaf else 0.0
+                    entry[2] += own
+                    # Recursion: count the cumulative time of a function once per stack
+                    cumulative = seconds if key not in keys[depth + 1:] else 0.0
+                    if cumulative:
+                        entry[0] += count
+                        entry[1] += count
+                        entry[3] += cumulative
+                    if depth:
+                        edge = entry[4].setdefault(keys[depth - 1], [0, 0, 0.0, 0.0])
+                        edge[0] += count
+                        edge[1] += count
+                        edge[2] += own
+                        edge[3] += seconds
+        with open(path, "wb") as f:
+            marshal.dump({key: (calls, primitive, own, cumulative,
+                                {caller: tuple(edge) for caller, edge in callers.items()})
+                          for key, (calls, primitive, own, cumulative, callers) in stats.items()}, f)
+        return path
+
+    @staticmethod
+    def _write_collapsed(path, lines):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in lines.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def print_summary(self, top=TOP_FUNCTIONS):
+        """Share of samples per stage, and each stage's hottest functions by self time."""
+        total = sum(sum(stacks.values()) for stacks in self.samples.values())
+        clock = "CPU" if self.use_timer else "wall"
+        print(f"\n--- Profile ({self.count} samples, every {self.interval * 1000:.0f} ms of {clock} time) ---")
+        for stage, stacks in sorted(self.samples.items(), key=lambda item: -sum(item[1].values())):
+            stage_total = sum(stacks.values())
+            print(f"{stage:>10}: {stage_total / total:6.1%} of samples")
+            own = Counter()
+            for stack, count in stacks.items():
+                own[stack[-1]] += count
+            for code, count in own.most_common(top):
+                print(f"{'':>12}{count / stage_total:6.1%}  {frame_label(code)}")
+        print("------------------\n")
+
+def profile_run(func, *args, profiler="sample", directory="profiles", interval=SAMPLE_INTERVAL):
+    """Runs func(*args) under the sampler (or cProfile if profiler="cprofile") and writes the profiles."""
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+    out = os.path.join(directory, f"run_{time.strftime('%Y%m%dT%H%M%S')}")
+    if profiler == "cprofile":
+        return _cprofile_run(func, args, out)
+    sampler = StackSampler(interval).start()
+    try:
+        return func(*args)
+    finally:
+        sampler.stop()
+        sampler.write(out)
+        sampler.write_pstats(os.path.join(out, "run.pstats"))
+        sampler.print_summary()
+        print(f"Profile written to {out} (render a .collapsed file with flamegraph.pl or speedscope, "
+              f"or read run.pstats with python -m pstats)")
+
+def _cprofile_run(func, args, out):
+    import cProfile
+    import pstats
+    cprofile = cProfile.Profile()
+    cprofile.enable()
+    try:
+        return func(*args)
+    finally:
+        cprofile.disable()
+        os.makedirs(out, exist_ok=True)
+        cprofile.dump_stats(os.path.join(out, "run.pstats"))
+        pstats.Stats(cprofile).sort_stats("tottime").print_stats(20)
+        print(f"Profile written to {out} (python -m pstats {os.path.join(out, 'run.pstats')})")
@@ -0,0 +1,125 @@
+"""Schema-on-read: infer column types from a sample and convert while parsing.
+
+infer_schema looks at the first SAMPLE_ROWS rows of a CSV and picks a type per
+column: "int" or "float" if at least MIN_TYPED_SHARE of the non-empty values
+parse as one (so a few dirty values don't turn a number column into text),
+else "str". Columns the validation rules declare integer (scripts/validation.py)
+are always "int": a dirty sample ("7.5") must not make marks a float column
+that validation then rejects row by row. TEXT_COLUMNS, which clean_record
+title-cases, are always "str", even when every sampled value is a number (a
+city column of PIN codes). Overrides ({"marks": "int"}) win over the guess,
+except for TEXT_COLUMNS.
+
+The readers then build each row with one converter per column, so marks
+arrives as an int straight from the parser and clean_record / the sinks
+don't convert it again. Empty values of typed columns become None; values
+that don't parse are kept as the raw string, so validation still quarantines
+them (or clean_record warns, with --no-validate).
+"""
+import csv
+import re
+from itertools import islice
+from scripts.compressed import open_text
+from scripts.validation import INT_PATTERN, RULES
+
+SAMPLE_ROWS = 1000
+MIN_TYPED_SHARE = 0.95
+SCHEMA_TYPES = ("int", "float", "str")
+TEXT_COLUMNS = ("name", "city")
+_INT = re.compile(INT_PATTERN)
+_FLOAT = re.compile(r"[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?")
+
+# Only what the patterns accept: int() and float() also take "٣", "1_000" or "inf"
+def _to_int(value):
+    stripped = (value or "").strip()
+    if _INT.fullmatch(stripped):
+        return int(stripped)
+    return None if not stripped else value
+
+def _to_float(value):
+    stripped = (value or "").strip()
+    if _FLOAT.fullmatch(stripped):
+        return float(stripped)
+    return None if not stripped else value
+
+CONVERTERS = {"int": _to_int, "float": _to_float, "str": None}
+
+def infer_type(values):
+    """"int", "float" or "str" for a sample of raw strings from one column."""
+    present = [value.strip() for value in values if value and value.strip()]
+    if not present:
+        return "str"
+    needed = len(present) * MIN_TYPED_SHARE
+    if sum(1 for value in present if _INT.fullmatch(value)) >= needed:
+        return "int"
+    if sum(1 for value in present if _FLOAT.fullmatch(value)) >= needed:
+        return "float"
+    return "str"
+
+def parse_overrides(specs):
+    """["marks=int", ...] (the --schema flags) as {"marks": "int"}."""
+    overrides = {}
+    for spec in specs or ():
+        column, _, type_name = spec.partition("=")
+        if type_name not in SCHEMA_TYPES:
+            raise ValueError(f"Bad schema override {spec!r}, expected COLUMN=TYPE with TYPE one of {SCHEMA_TYPES}")
+        if column.strip() in TEXT_COLUMNS and type_name != "str":
+            raise ValueError(f"Bad schema override {spec!r}: {column.strip()} is cleaned as text, so it stays str")
+        overrides[column.strip()] = type_name
+    return overrides
+
+def infer_schema(filepath, sample_rows=SAMPLE_ROWS, overrides=None, rules=RULES):
+    """{column: type} for the CSV at filepath, from its first sample_rows rows, rules and overrides."""
+    with open_text(filepath) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        sample = [row for row in islice(reader, sample_rows) if row]
+    schema = {
+        column: "str" if column in TEXT_COLUMNS else infer_type(row[i] if i < len(row) else "" for row in sample)
+        for i, column in enumerate(header)
+    }
+    for column, rule in (rules or {}).items():
+        if rule.get("integer") and column in schema:
+            schema[column] = "int"
+    schema.update(overrides or {})
+    typed = ", ".join(f"{column}:{type_name}" for column, type_name in schema.items())
+    print(f"Schema from {len(sample)} sampled rows: {typed}")
+    return schema
+
+def row_converter(fields, schema):
+    """Function that turns one csv.reader row (list of str) into a dict of typed values."""
+    fields = list(fields)
+    converters = [CONVERTERS[schema.get(field, "str")] for field in fields]
+    width = len(fields)
+    if not any(converters):
+        return lambda values: dict(zip(fields, values))
+    pairs = [(field, convert or (lambda value: value)) for field, convert in zip(fields, converters)]
+
+    def convert_row(values):
+        if len(values) < width:
+            values = values + [None] * (width - len(values))  # like DictReader's restval
+        return {field: convert(value) for (field, convert), value in zip(pairs, values)}
+    return convert_row
+
+def read_typed(f, schema):
+    """Yields typed dicts from an open text stream, like csv.DictReader(f) with converted values."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    convert = row_converter(header, schema)
+    for values in reader:
+        if values:  # DictReader skips blank lines too
+            yield convert(values)
+
+def typed_rows(rows, schema):
+    """Converts rows that were parsed as strings (dicts or mmap-reader namedtuples)."""
+    convert = None
+    for row in rows:
+        if convert is None:  # every row of one file has the same fields
+            fields = row._fields if isinstance(row, tuple) else list(row)
+            convert = row_converter(fields, schema)
+        if isinstance(row, tuple):
+            yield row._make(convert(list(row)).values())
+        else:
+            yield convert([row.get(field) for field in fields])
@@ -0,0 +1,110 @@
+"""Sharded extract: a directory or glob of CSV files, parsed in parallel.
+
+Daily drops arrive as many CSV files (plain or compressed, see
+scripts/compressed.py). expand_inputs turns a file, directory or glob into the
+sorted list of shards; iter_shards reads, validates and cleans every shard in
+a worker process and hands the results back as they finish, and shard_batches
+merges them into one stream of batches for the load stage, which keeps
+writing while the next shards are still being parsed.
+
+At most workers * SHARDS_IN_FLIGHT shards are submitted at a time, so a slow
+sink doesn't let hundreds of parsed files pile up in memory. Rows arrive in
+shard completion order, not file order.
+"""
+import csv
+import glob
+import os
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from scripts.compressed import open_text
+from scripts.schema import read_typed
+from scripts.loader import clean_record, batched
+from scripts.validation import row_reasons, report_rejects
+
+SHARD_PATTERNS = ("*.csv", "*.csv.gz", "*.csv.bz2", "*.csv.xz", "*.csv.zst")
+SHARDS_IN_FLIGHT = 2
+
+ShardResult = namedtuple("ShardResult", "path bytes rows cleaned rejects read_seconds clean_seconds")
+
+def expand_inputs(spec, exclude=()):
+    """Sorted CSV files named by spec: a file, a directory (SHARD_PATTERNS inside it) or a glob."""
+    if os.path.isdir(spec):
+        paths = [p for pattern in SHARD_PATTERNS for p in glob.glob(os.path.join(spec, pattern))]
+    elif any(c in spec for c in "*?["):
+        paths = glob.glob(spec, recursive=True)
+    else:
+        paths = [spec]
+    # e.g. the quarantine file, which lives in the same data folder
+    skip = {os.path.abspath(p) for p in exclude}
+    return sorted(p for p in set(paths) if os.path.isfile(p) and os.path.abspath(p) not in skip)
+
+def _process_shard(path, rules=None, read_ahead=False, schema=None):
+    """Worker-process entry point: extract + validate + clean one file."""
+    start = time.perf_counter()
+    with open_text(path, read_ahead) as f:
+        raw = list(read_typed(f, schema) if schema else csv.DictReader(f))
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cleaned, rejects = [], []
+    for record in raw:
+        reasons = row_reasons(record, rules) if rules is not None else None
+        if reasons:
+            rejects.append((record, reasons))
+        else:
+            cleaned.append(clean_record(record))
+    return ShardResult(path, os.path.getsize(path), len(raw), cleaned, rejects,
+                       read_seconds, time.perf_counter() - start)
+
+def iter_shards(paths, workers=1, rules=None, read_ahead=False, schema=None):
+    """Yields a ShardResult per file as the files finish; workers=1 reads them here, in order."""
+    if workers <= 1:
+        for path in paths:
+            yield _process_shard(path, rules, read_ahead, schema)
+        return
+    paths = iter(paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {pool.submit(_process_shard, path, rules, read_ahead, schema)
+                   for path in islice(paths, workers * SHARDS_IN_FLIGHT)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending |= {pool.submit(_process_shard, path, rules, read_ahead, schema)
+                        for path in islice(paths, len(done))}
+            for future in done:
+                yield future.result()
+    finally:
+        # The consumer may stop early (error in the sink): don't start the queued shards
+        pool.shutdown(cancel_futures=True)
+
+def shard_batches(shards, batch_size=1000, report=None, quarantine=None):
+    """Merges ShardResults into batches of cleaned rows; rejects go to quarantine.
+
+    Extract / transform seconds in the report are summed over the workers
+    (CPU time spent per stage), not wall time.
+    """
+    extract = report.stage("extract") if report else None
+    transform = report.stage("transform") if report else None
+    counts = Counter()
+    rejected = 0
+    files = 0
+    try:
+        for shard in shards:
+            files += 1
+            if report:
+                extract.rows += shard.rows
+                extract.bytes += shard.bytes
+                extract.seconds += shard.read_seconds
+                transform.rows += len(shard.cleaned)
+                transform.seconds += shard.clean_seconds
+            if shard.rejects:
+                if quarantine is not None:
+                    quarantine.write(shard.rejects)
+                counts.update(r for _, reasons in shard.rejects for r in reasons)
+                rejected += len(shard.rejects)
+            yield from batched(shard.cleaned, batch_size)
+    finally:
+        print(f"Extracted {files} shard{'s' if files != 1 else ''}.")
+        report_rejects(counts, rejected)
@@ -0,0 +1,66 @@
+"""Deterministic synthetic students.csv generator for benchmarks.
+
+The same (rows, dirty_ratio, cities, seed) always gives a byte-identical file,
+so benchmark runs on different commits read exactly the same input.
+
+Run from the day_16 folder:
+    python -m scripts.synth data/students_1m.csv --rows 1000000
+    python -m scripts.synth big.csv --rows 100000 --dirty-ratio 0.2 --cities 500
+"""
+import csv
+import random
+import argparse
+
+FIRST_NAMES = ["Tanveer", "Banjeet", "Asha", "Ravi", "Meera", "Kiran", "Arjun", "Fatima", "John", "Priya"]
+BASE_CITIES = ["Munger", "Belgaum", "Pallavaram", "Tiruchirappalli", "Pune", "Delhi"]
+BAD_MARKS = ["", "abc", "7.5", " ", "N/A"]
+
+def make_cities(cardinality):
+    """The first `cardinality` city names; made-up ones are added past the real ones."""
+    if cardinality < 1:
+        raise ValueError("cardinality must be at least 1")
+    extra = [f"City{i}" for i in range(len(BASE_CITIES), cardinality)]
+    return (BASE_CITIES + extra)[:cardinality]
+
+def _messy(value, rng):
+    """Random padding and case, the kind of noise clean_record strips out."""
+    value = rng.choice((str.lower, str.upper, str.title))(value)
+    return " " * rng.randint(0, 2) + value + " " * rng.randint(0, 2)
+
+def iter_students(rows, dirty_ratio=0.05, cities=len(BASE_CITIES), seed=42):
+    """Yields (name, marks, city) rows; dirty_ratio of them have messy text and invalid marks."""
+    if not 0 <= dirty_ratio <= 1:
+        raise ValueError("dirty_ratio must be between 0 and 1")
+    rng = random.Random(seed)
+    city_names = make_cities(cities)
+    for i in range(rows):
+        name = f"{rng.choice(FIRST_NAMES)} Student{i}"
+        city = rng.choice(city_names)
+        if rng.random() < dirty_ratio:
+            yield _messy(name, rng), rng.choice(BAD_MARKS), _messy(city, rng)
+        else:
+            yield name, str(rng.randint(0, 100)), city
+
+def write_students_csv(path, rows, dirty_ratio=0.05, cities=len(BASE_CITIES), seed=42):
+    """Writes a students.csv with the name,marks,city header and returns its path."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "marks", "city"])
+        writer.writerows(iter_students(rows, dirty_ratio, cities, seed))
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic students.csv")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--dirty-ratio", type=float, default=0.05,
+                        help="share of rows with messy text and invalid marks (default 0.05)")
+    parser.add_argument("--cities", type=int, default=len(BASE_CITIES),
+                        help=f"number of distinct cities (default {len(BASE_CITIES)})")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_students_csv(args.path, args.rows, args.dirty_ratio, args.cities, args.seed)
+    print(f"Wrote {args.rows:,} rows to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Validation stage: declarative per-column rules + a quarantine file for bad rows.
+
+Rules are plain data, one dict per column, so the row engine (validate /
+iter_valid) and the columnar engine (validate_frame) check exactly the same
+things. Values already converted by a typed read (scripts/schema.py) are
+checked as they are; strings are stripped first. Supported checks:
+    required: True        -> empty / missing values fail
+    integer: True         -> must look like an int (INT_PATTERN)
+    min / max: number     -> numeric bounds (for integer columns)
+    pattern: regex        -> must fully match
+    choices: collection   -> must be one of these
+
+Rows that fail go to a QuarantineSink with their reasons, written in bulk;
+the console only gets one summary line with the count per reason.
+"""
+import re
+import csv
+import os
+from collections import Counter
+
+# [0-9], not \d: re counts any Unicode digit ("٣") as \d, pyarrow's RE2 (the columnar engine) doesn't
+INT_PATTERN = r"[+-]?[0-9]+"
+_INT = re.compile(INT_PATTERN)
+
+RULES = {
+    "name": {"required": True},
+    "marks": {"required": True, "integer": True},
+    "city": {"required": True},
+}
+
+QUARANTINE_FLUSH_ROWS = 10000
+
+def _value(record, column):
+    if isinstance(record, tuple):  # mmap-reader namedtuple
+        value = getattr(record, column, None)
+    else:
+        value = record.get(column)
+    if value is None:
+        return ""
+    return value.strip() if isinstance(value, str) else value
+
+def _whole_number(value):
+    """Typed values: an int, or a float without a fraction (80.0 from a --schema marks=float read)."""
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+def row_reasons(record, rules=RULES):
+    """Why record breaks the rules, as a list of "<column>: <problem>" strings (empty if valid)."""
+    reasons = []
+    for column, rule in rules.items():
+        value = _value(record, column)
+        if value == "":
+            if rule.get("required"):
+                reasons.append(f"{column}: missing")
+            continue
+        if rule.get("integer") and not (_INT.fullmatch(value) if isinstance(value, str)
+                                        else _whole_number(value)):
+            reasons.append(f"{column}: not an integer")
+            continue
+        if "min" in rule or "max" in rule:
+            try:
+                number = int(value) if rule.get("integer") else float(value)
+            except ValueError:
+                reasons.append(f"{column}: not a number")
+                continue
+            if "min" in rule and number < rule["min"]:
+                reasons.append(f"{column}: below {rule['min']}")
+            if "max" in rule and number > rule["max"]:
+                reasons.append(f"{column}: above {rule['max']}")
+        if "pattern" in rule and not re.fullmatch(rule["pattern"], str(value)):
+            reasons.append(f"{column}: does not match {rule['pattern']}")
+        if "choices" in rule and value not in rule["choices"]:
+            reasons.append(f"{column}: not an allowed value")
+    return reasons
+
+class QuarantineSink:
+    """Collects rejected rows with their reasons into one CSV file per run.
+
+    Rows are buffered and written flush_rows at a time; flush() writes the
+    rest now (e.g. before a checkpoint). append=True keeps the rows of an
+    earlier run (a resumed load, or the previous increments).
+    """
+
+    def __init__(self, path, append=False, flush_rows=QUARANTINE_FLUSH_ROWS):
+        self.path = path
+        self.append = append
+        self.flush_rows = flush_rows
+        self.file = None
+        self.writer = None
+        self.fields = None
+        self.pending = []
+        self.rows = 0
+
+    def _open(self, fields):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.fields = list(fields)
+        keep = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self.file = open(self.path, "a" if keep else "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if not keep:
+            self.writer.writerow(self.fields + ["reasons"])
+
+    def write(self, rejects):
+        """rejects: list of (raw record, reasons) pairs."""
+        self.pending.extend(rejects)
+        self.rows += len(rejects)
+        if len(self.pending) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            if self.file is None:
+                first = self.pending[0][0]
+                self._open(first._fields if isinstance(first, tuple) else first.keys())
+            self.writer.writerows(
+                [*(record if isinstance(record, tuple) else (record.get(f) for f in self.fields)),
+                 "; ".join(reasons)]
+                for record, reasons in self.pending
+            )
+            self.pending = []
+        if self.file is not None:
+            self.file.flush()
+
+    def write_frame(self, rejected):
+        """Columnar counterpart of write: a DataFrame of raw columns plus a "reasons" column."""
+        if rejected.empty:
+            return
+        self.flush()
+        if self.file is None:
+            self._open([c for c in rejected.columns if c != "reasons"])
+        rejected[self.fields + ["reasons"]].to_csv(self.file, header=False, index=False)
+        self.rows += len(rejected)
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            print(f"Quarantined {self.rows} rows to {self.path}.")
+
+def report_rejects(counts, rows):
+    """The one console line of a validation pass (instead of a warning per row)."""
+    if rows:
+        summary = ", ".join(f"{reason} x{count}" for reason, count in counts.most_common())
+        print(f"Warning: {rows} records failed validation ({summary}).")
+
+def split_valid(records, rules=RULES):
+    """(records that pass the rules, [(record, reasons), ...] of the rest)."""
+    valid, rejects = [], []
+    for record in records:
+        reasons = row_reasons(record, rules)
+        if reasons:
+            rejects.append((record, reasons))
+        else:
+            valid.append(record)
+    return valid, rejects
+
+def validate(records, rules=RULES, quarantine=None):
+    """Returns the records that pass the rules; the rest go to quarantine (if given)."""
+    valid, rejects = split_valid(records, rules)
+    if quarantine is not None:
+        quarantine.write(rejects)
+    report_rejects(Counter(r for _, reasons in rejects for r in reasons), len(rejects))
+    return valid
+
+def iter_valid(records, rules=RULES, quarantine=None):
+    """Streaming validate: yields passing records and hands the rest to quarantine (which buffers them)."""
+    counts = Counter()
+    rejected = 0
+    try:
+        for record in records:
+            reasons = row_reasons(record, rules)
+            if not reasons:
+                yield record
+                continue
+            if quarantine is not None:
+                quarantine.write([(record, reasons)])
+            counts.update(reasons)
+            rejected += 1
+    finally:
+        report_rejects(counts, rejected)
+
+def validate_frame(df, rules=RULES, quarantine=None):
+    """Vectorized validate for the columnar engine: one boolean mask per check, no Python loop per row."""
+    import pandas as pd
+
+    reasons = pd.Series("", index=df.index, dtype=object)
+    for column, rule in rules.items():
+        values = df[column].fillna("").str.strip() if column in df else pd.Series("", index=df.index)
+        present = (values.str.len() > 0).astype(bool)
+        checks = []
+        if rule.get("required"):
+            checks.append((~present, f"{column}: missing"))
+        well_formed = present
+        if rule.get("integer"):
+            is_int = values.str.fullmatch(INT_PATTERN).fillna(False).astype(bool)
+            checks.append((present & ~is_int, f"{column}: not an integer"))
+            well_formed = present & is_int
+        if "min" in rule or "max" in rule:
+            numbers = pd.to_numeric(values.where(well_formed), errors="coerce")
+            checks.append((well_formed & numbers.isna(), f"{column}: not a number"))
+            if "min" in rule:
+                checks.append(((numbers < rule["min"]).astype(bool), f"{column}: below {rule['min']}"))
+            if "max" in rule:
+                checks.append(((numbers > rule["max"]).astype(bool), f"{column}: above {rule['max']}"))
+        if "pattern" in rule:
+            matches = values.str.fullmatch(rule["pattern"]).fillna(False).astype(bool)
+            checks.append((well_formed & ~matches, f"{column}: does not match {rule['pattern']}"))
+        if "choices" in rule:
+            allowed = values.isin(list(rule["choices"])).astype(bool)
+            checks.append((well_formed & ~allowed, f"{column}: not an allowed value"))
+        for mask, reason in checks:
+            reasons = reasons + mask.map({True: reason + "; ", False: ""})
+
+    bad = (reasons.str.len() > 0).astype(bool)
+    if not bad.any():
+        return df
+    rejected = df[bad].assign(reasons=reasons[bad].str.removesuffix("; "))
+    if quarantine is not None:
+        quarantine.write_frame(rejected)
+    counts = Counter(r for rs in rejected["reasons"].str.split("; ") for r in rs)
+    report_rejects(counts, len(rejected))
+    return df[~bad]